@@ -0,0 +1,360 @@
+"""
+asyncio serving backend for server.py.
+
+Implements the same routes as GalleryRequestHandler (the app page, static
+media with Range, and the JSON API) on coroutines, so thousands of idle
+keep-alive connections cost a coroutine each instead of an OS thread.
+Filesystem work runs in a thread pool and media bodies are streamed with
+loop.sendfile (os.sendfile underneath where available).
+
+Start it with `python server.py --backend asyncio`.
+"""
+
+import asyncio
+import json
+import os
+import posixpath
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+
+import byte_ranges
+import server
+
+MAX_HEADER_LINE = 65536
+MAX_HEADERS = 100
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body=b""):
+        self.method = method
+        self.target = target
+        self.path = target.split('?', 1)[0].split('#', 1)[0]
+        self.version = version
+        self.headers = headers  # lower-cased names
+        self.body = body
+        self.status = None  # Set once the response head is written
+        self.bytes_sent = 0
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+
+class BadRequest(Exception):
+    pass
+
+
+async def read_request(reader):
+    """Parse one request from the stream. Returns None on a clean EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if len(line) > MAX_HEADER_LINE:
+        raise BadRequest("Request line too long")
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise BadRequest("Bad request line")
+
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise BadRequest("Too many headers")
+
+    body = b""
+    length = headers.get('content-length')
+    if length:
+        try:
+            body = await reader.readexactly(int(length))
+        except ValueError:
+            raise BadRequest("Bad Content-Length")
+    return Request(method.upper(), target, version, headers, body)
+
+
+def translate_path(path):
+    """Map a URL path onto the served directory, the way SimpleHTTPRequestHandler does."""
+    path = urllib.parse.unquote(path, errors='surrogatepass')
+    path = posixpath.normpath(path)
+    result = os.getcwd()
+    for word in filter(None, path.split('/')):
+        if os.path.dirname(word) or word in (os.curdir, os.pardir):
+            continue
+        result = os.path.join(result, word)
+    return result
+
+
+def open_media(path):
+    """Lease a regular file for streaming: (file, stat, content type, release) or None."""
+    try:
+        lease = server.get_open_files().acquire(path)
+    except OSError:
+        return None
+    return lease.file, lease.stat, lease.content_type, lease.release
+
+
+def open_asset(path):
+    """Open a generated asset. These bypass the open-file cache, which their LRU touches would defeat."""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    return f, os.fstat(f.fileno()), None, f.close
+
+
+class AsyncGalleryServer:
+    def __init__(self, workers=None, quiet=False):
+        self.executor = ThreadPoolExecutor(max_workers=workers or server.POOL_SIZE,
+                                           thread_name_prefix="fs-worker")
+        self.quiet = quiet
+        self.loop = None
+
+    async def run_blocking(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    async def handle_connection(self, reader, writer):
+        self.loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info('peername') or ('-', 0)
+        served = 0
+        server.METRICS.connection_opened()
+        try:
+            while served < server.MAX_KEEPALIVE_REQUESTS:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), server.KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    break
+                except BadRequest as e:
+                    server.METRICS.error(BadRequest)
+                    await self.send_error(writer, None, 400, str(e), keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                served += 1
+                keep_alive = request.keep_alive and served < server.MAX_KEEPALIVE_REQUESTS
+                started = time.perf_counter()
+                try:
+                    status = await self.dispatch(request, writer, keep_alive)
+                finally:
+                    self.record(request, started)
+                self.log_request(peer[0], request, status)
+                if not keep_alive or status is None:
+                    break
+        except (ConnectionError, OSError) as e:
+            server.METRICS.error(type(e))
+        except Exception as e:
+            server.METRICS.error(type(e))
+            raise
+        finally:
+            server.METRICS.connection_closed()
+            writer.close()
+
+    def record(self, request, started):
+        """Report a finished request to server.METRICS (if a response was started)."""
+        if request.status is None:
+            return
+        route = server.route_label(request.method, request.path, 'range' in request.headers)
+        server.METRICS.request_finished(route, request.method, request.target, request.status,
+                                        time.perf_counter() - started, request.bytes_sent)
+
+    async def dispatch(self, request, writer, keep_alive):
+        """Route a request. Returns the status sent, or None if the connection must close."""
+        if request.method == 'POST':
+            return await self.handle_api(request, writer, keep_alive)
+        if request.method in ('GET', 'HEAD'):
+            if request.path == server.METRICS_PATH:
+                body = server.METRICS.render().encode('utf-8')
+                return await self.send(writer, request, 200, {'Content-type': server.METRICS_CONTENT_TYPE},
+                                       body, keep_alive)
+            if request.path in server.APP_ROUTES:
+                return await self.handle_app(request, writer, keep_alive)
+            if server.asset_route(request.path):
+                return await self.handle_asset(request, writer, keep_alive)
+            return await self.handle_media(request, writer, keep_alive)
+        return await self.send_error(writer, request, 501, f"Unsupported method ({request.method!r})", keep_alive)
+
+    async def handle_api(self, request, writer, keep_alive):
+        route = server.API_ROUTES.get(request.path)
+        if route is None:
+            return await self.send_error(writer, request, 404, "API endpoint not found", keep_alive)
+        try:
+            data = json.loads(request.body.decode('utf-8')) if request.body.strip() else {}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return await self.send_error(writer, request, 400, "Invalid JSON", keep_alive)
+
+        try:
+            result = await self.run_blocking(route, data)
+        except server.ApiError as e:
+            return await self.send_error(writer, request, e.status, str(e), keep_alive)
+        except Exception as e:
+            server.METRICS.error(type(e))
+            return await self.send_error(writer, request, 500, str(e), keep_alive)
+
+        body = json.dumps(result).encode('utf-8')
+        return await self.send(writer, request, 200, {'Content-type': 'application/json'}, body, keep_alive)
+
+    async def handle_app(self, request, writer, keep_alive):
+        html_path = server.SCRIPT_DIR / "video-organizer.html"
+        try:
+            body, etag, mtime = await self.run_blocking(server.app_shell)
+        except FileNotFoundError:
+            print(f"HTML file not found at: {html_path}")
+            return await self.send_error(writer, request, 404, f"HTML file not found at {html_path}", keep_alive)
+        except OSError as e:
+            print(f"Error serving HTML: {e}")
+            return await self.send_error(writer, request, 500, f"Error loading HTML: {e}", keep_alive)
+
+        headers = self.validators(request, etag)
+        if server.etag_matches(request.headers.get('if-none-match'), etag):
+            self.write_head(writer, request, 304, headers, keep_alive)
+            await writer.drain()
+            return 304
+        headers.update({'Content-type': 'text/html', 'Last-Modified': formatdate(mtime, usegmt=True)})
+        return await self.send(writer, request, 200, headers, body, keep_alive)
+
+    async def handle_asset(self, request, writer, keep_alive):
+        try:
+            path, content_type = await self.run_blocking(server.asset_file, request.target)
+        except server.ApiError as e:
+            return await self.send_error(writer, request, e.status, str(e), keep_alive)
+        except server.RenderPending:
+            headers = {'Content-Type': 'text/plain;charset=utf-8', 'Retry-After': str(server.RETRY_AFTER),
+                       'Cache-Control': 'no-store'}
+            return await self.send(writer, request, 503, headers, b"Still rendering, retry shortly\n", keep_alive)
+        return await self.handle_media(request, writer, keep_alive, str(path), content_type, asset=True)
+
+    async def handle_media(self, request, writer, keep_alive, path=None, content_type=None, asset=False):
+        path = path or translate_path(request.path)
+        opened = await self.run_blocking(open_asset if asset else open_media, path)
+        if opened is None:
+            return await self.send_error(writer, request, 404, "File not found", keep_alive)
+
+        f, fs, guessed_type, release = opened
+        try:
+            file_len = fs.st_size
+            etag = server.asset_etag(path, fs) if asset else server.file_etag(fs)
+            headers = self.validators(request, etag)
+            if server.client_copy_current(request.headers.get('if-none-match'),
+                                          request.headers.get('if-modified-since'), etag, fs.st_mtime):
+                self.write_head(writer, request, 304, headers, keep_alive)
+                await writer.drain()
+                return 304
+
+            headers['Content-type'] = content_type or guessed_type
+            headers['Last-Modified'] = formatdate(fs.st_mtime, usegmt=True)
+            range_header = request.headers.get('range')
+            if not server.if_range_matches(request.headers.get('if-range'), etag, fs.st_mtime):
+                range_header = None  # Changed since the client's partial copy: send it all
+            try:
+                spans = byte_ranges.parse(range_header, file_len)
+            except byte_ranges.RangeNotSatisfiable:
+                headers = {'Content-Range': f"bytes */{file_len}"}
+                return await self.send(writer, request, 416, headers, b"", keep_alive)
+
+            if not spans:
+                status, segments = 200, [(0, file_len)]
+                headers['Content-Length'] = str(file_len)
+            elif len(spans) == 1:
+                (start, end), = spans
+                status, segments = 206, [(start, end - start + 1)]
+                headers['Content-Range'] = byte_ranges.content_range(start, end, file_len)
+                headers['Content-Length'] = str(end - start + 1)
+            else:
+                multipart = byte_ranges.Multipart(spans, file_len, headers['Content-type'])
+                status, segments = 206, list(multipart.segments())
+                headers['Content-type'] = multipart.content_type
+                headers['Content-Length'] = str(multipart.length)
+
+            self.write_head(writer, request, status, headers, keep_alive)
+            await writer.drain()
+            if request.method != 'HEAD':
+                try:
+                    for segment in segments:
+                        if isinstance(segment, bytes):
+                            writer.write(segment)  # Multipart boundary and part headers
+                            request.bytes_sent += len(segment)
+                        elif segment[1] > 0:
+                            request.bytes_sent += await self.loop.sendfile(writer.transport, f, *segment)
+                    await writer.drain()
+                except (ConnectionError, OSError) as e:
+                    server.METRICS.error(type(e))
+                    return None
+            return status
+        finally:
+            await self.run_blocking(release)
+
+    def validators(self, request, etag):
+        """ETag and caching headers for a file response."""
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+        policy = server.cache_control(request.path)
+        if policy:
+            headers['Cache-Control'] = policy
+        return headers
+
+    def write_head(self, writer, request, status, headers, keep_alive):
+        version = request.version if request and request.version in ('HTTP/1.0', 'HTTP/1.1') else 'HTTP/1.1'
+        lines = [f"{version} {status} {HTTPStatus(status).phrase}",
+                 f"Date: {formatdate(usegmt=True)}",
+                 "Server: VideoOrganizer-asyncio"]
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}")
+        if keep_alive:
+            lines.append("Connection: keep-alive")
+            lines.append(f"Keep-Alive: timeout={server.KEEPALIVE_TIMEOUT}")
+        else:
+            lines.append("Connection: close")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+        writer.write(head)
+        if request is not None:
+            request.status = status
+            request.bytes_sent += len(head)
+
+    async def send(self, writer, request, status, headers, body, keep_alive):
+        headers.setdefault('Content-Length', str(len(body)))
+        self.write_head(writer, request, status, headers, keep_alive)
+        if body and (request is None or request.method != 'HEAD'):
+            writer.write(body)
+            if request is not None:
+                request.bytes_sent += len(body)
+        await writer.drain()
+        return status
+
+    async def send_error(self, writer, request, status, message, keep_alive):
+        body = f"Error {status}: {message}\n".encode('utf-8', 'replace')
+        return await self.send(writer, request, status, {'Content-Type': 'text/plain;charset=utf-8'}, body, keep_alive)
+
+    def log_request(self, host, request, status):
+        if self.quiet:
+            return
+        stamp = time.strftime("%d/%b/%Y %H:%M:%S")
+        line = f"{request.method} {request.target} {request.version}"
+        sys.stderr.write(f'{host} - - [{stamp}] "{line}" {status if status is not None else "-"} -\n')
+
+    async def serve(self, host, port, started=None):
+        """Serve until cancelled. started(sockname) is called once listening."""
+        srv = await asyncio.start_server(self.handle_connection, host, port,
+                                         limit=MAX_HEADER_LINE, reuse_address=True)
+        if started:
+            started(srv.sockets[0].getsockname())
+        async with srv:
+            await srv.serve_forever()
+
+
+def run(port=None, host=""):
+    app = AsyncGalleryServer()
+    try:
+        asyncio.run(app.serve(host or None, port or server.PORT))
+    finally:
+        app.executor.shutdown(wait=False)
+        server.close_services()
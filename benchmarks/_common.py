@@ -0,0 +1,116 @@
+"""
+Shared helpers for the benchmark scripts.
+Run benchmarks from the repository root, e.g. `python -m benchmarks.sendfile_bench`.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent.resolve()
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+import server  # noqa: E402
+import async_server  # noqa: E402
+
+
+def make_sparse_file(path: Path, size: int) -> Path:
+    """Create a file of the given size without writing its contents."""
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return path
+
+
+def make_random_file(path: Path, size: int, chunk: int = 1 << 20) -> Path:
+    """Create a file filled with real bytes so it lands in the page cache."""
+    block = os.urandom(min(size, chunk))
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            n = min(len(block), size - written)
+            f.write(block[:n])
+            written += n
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where unavailable, e.g. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_summary(seconds):
+    """Count, median, p95, p99 and max of a list of durations, in milliseconds."""
+    ordered = sorted(seconds)
+    if not ordered:
+        return {"count": 0}
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def temp_library() -> tempfile.TemporaryDirectory:
+    return tempfile.TemporaryDirectory(prefix="video-organizer-bench-")
+
+
+def start_server(directory: Path, server_cls=None, handler_cls=None):
+    """Serve directory on a free port in a background thread. Returns (httpd, port)."""
+    os.chdir(directory)
+    server_cls = server_cls or server.ThreadedHTTPServer
+    handler_cls = handler_cls or server.GalleryRequestHandler
+    # Keep the access log out of the benchmark output
+    handler_cls = type("Quiet" + handler_cls.__name__, (handler_cls,), {"log_message": lambda *a: None})
+    server_cls.allow_reuse_address = True
+    httpd = server_cls(("127.0.0.1", 0), handler_cls)
+    httpd.daemon_threads = True
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    return httpd, httpd.server_address[1]
+
+
+def stop_server(httpd):
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def start_async_server(directory: Path):
+    """Run the asyncio backend on a free port in a background thread. Returns (stop, port)."""
+    os.chdir(directory)
+    app = async_server.AsyncGalleryServer(quiet=True)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = []
+
+    def on_started(sockname):
+        address.append(sockname)
+        started.set()
+
+    task = loop.create_task(app.serve("127.0.0.1", 0, started=on_started))
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+    started.wait(5)
+
+    async def shutdown():
+        pending = [x for x in asyncio.all_tasks() if x is not asyncio.current_task()]
+        for x in pending:
+            x.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        t.join(5)
+        app.executor.shutdown(wait=False)
+
+    return stop, address[0][1]
@@ -0,0 +1,143 @@
+"""
+Run the same request set against the threaded and asyncio backends: first a
+conformance pass (status codes, bodies and Range headers must match the
+expectations for both), then a throughput run with many keep-alive clients.
+
+    python -m benchmarks.backend_bench --clients 64 --requests 200
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from pathlib import Path
+
+from benchmarks._common import (server, make_random_file, temp_library, start_server, stop_server,
+                                start_async_server)
+
+CLIP_SIZE = 4 << 20
+
+# (method, path, body, headers, expected status, expected header values)
+CONFORMANCE_CASES = [
+    ("GET", "/", None, {}, 200, {"Content-Type": "text/html"}),
+    ("GET", "/clip.mp4", None, {}, 200, {"Content-Length": str(CLIP_SIZE)}),
+    ("HEAD", "/clip.mp4", None, {}, 200, {"Content-Length": str(CLIP_SIZE)}),
+    ("GET", "/clip.mp4", None, {"Range": "bytes=0-99"}, 206,
+     {"Content-Range": f"bytes 0-99/{CLIP_SIZE}", "Content-Length": "100"}),
+    ("GET", "/clip.mp4", None, {"Range": "bytes=100-"}, 206,
+     {"Content-Range": f"bytes 100-{CLIP_SIZE - 1}/{CLIP_SIZE}"}),
+    ("GET", "/clip.mp4", None, {"Range": f"bytes={CLIP_SIZE}-"}, 416,
+     {"Content-Range": f"bytes */{CLIP_SIZE}"}),
+    ("GET", "/clip.mp4", None, {"If-None-Match": "*"}, 304, {"Cache-Control": "max-age"}),
+    ("GET", "/clip.mp4", None, {"Range": "bytes=0-99", "If-Range": '"stale"'}, 200,
+     {"Content-Length": str(CLIP_SIZE)}),
+    ("GET", "/", None, {"If-None-Match": "*"}, 304, {"Cache-Control": "no-cache"}),
+    ("GET", "/missing.mp4", None, {}, 404, {}),
+    ("POST", "/api/list", b"", {}, 200, {"Content-Type": "application/json"}),
+    ("POST", "/api/nope", b"{}", {}, 404, {}),
+    ("POST", "/api/move", b"{}", {}, 400, {}),
+    ("POST", "/api/move", b'{"filename": "../x.mp4", "target": "Keep"}', {}, 403, {}),
+    ("POST", "/api/move", b'{"filename": "gone.mp4", "target": "Keep"}', {}, 404, {}),
+    ("POST", "/api/move", b'{"filename": "move.mp4", "target": "Keep"}', {}, 200, {}),
+    ("POST", "/api/move", b'{"filename": "Keep/move.mp4", "target": "."}', {}, 200, {}),
+    ("POST", "/api/delete", b'{"filename": "move.mp4"}', {}, 200, {}),
+    ("POST", "/api/move", b'{"filename": "trash/move.mp4", "target": "."}', {}, 200, {}),
+    ("POST", "/api/list", b"{not json", {}, 400, {}),
+]
+
+
+def check_conformance(port, expected_files):
+    failures = []
+    for method, path, body, headers, status, expect_headers in CONFORMANCE_CASES:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        data = resp.read()
+        conn.close()
+        label = f"{method} {path} {headers or ''} {body or ''}"
+        if resp.status != status:
+            failures.append(f"{label}: status {resp.status}, expected {status}")
+        for name, value in expect_headers.items():
+            got = resp.getheader(name, "")
+            if not got.startswith(value):
+                failures.append(f"{label}: {name} {got!r}, expected {value!r}")
+        if path == "/api/list" and status == 200 and json.loads(data)["files"] != expected_files:
+            failures.append(f"{label}: unexpected file list")
+    return failures
+
+
+def client(port, requests, counts):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done = 0
+    for i in range(requests):
+        offset = (i * 65536) % CLIP_SIZE
+        try:
+            if i % 10 == 0:
+                conn.request("POST", "/api/list", body=b"{}")
+            else:
+                conn.request("GET", "/clip.mp4", headers={"Range": f"bytes={offset}-{offset + 65535}"})
+            resp = conn.getresponse()
+            resp.read()
+            done += 1
+            if resp.will_close:
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.close()
+    counts.append(done)
+
+
+def throughput(port, clients, requests):
+    counts = []
+    threads = [threading.Thread(target=client, args=(port, requests, counts)) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done = sum(counts)
+    return {"requests": done, "errors": clients * requests - done, "req_per_s": round(done / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    args = parser.parse_args()
+
+    report = []
+    ok = True
+    with temp_library() as tmp:
+        root = Path(tmp)
+        make_random_file(root / "clip.mp4", CLIP_SIZE)
+        make_random_file(root / "move.mp4", 1024)
+        (root / "Keep").mkdir()
+        expected_files = ["clip.mp4", "move.mp4"]
+
+        backends = [
+            ("threads", lambda: start_server(root, server_cls=server.PooledHTTPServer)),
+            ("asyncio", lambda: start_async_server(root)),
+        ]
+        for name, start in backends:
+            handle, port = start()
+            try:
+                failures = check_conformance(port, expected_files)
+                for failure in failures:
+                    print(f"❌ [{name}] {failure}")
+                ok = ok and not failures
+                row = {"backend": name, "conformance_failures": len(failures)}
+                row.update(throughput(port, args.clients, args.requests))
+                report.append(row)
+            finally:
+                handle() if callable(handle) else stop_server(handle)
+
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Duplicate detection on a synthetic library: how long a scan takes, how many
+bytes it reads against the library's total, and whether it finds exactly
+the planted copies. The library is sparse files (sizes of 1-64 MB that take
+no disk space) spread over nested folders, with a few percent of them
+sharing a size and differing only in their first bytes, only in the
+middle, or not at all.
+
+    python -m benchmarks.duplicates_bench --files 50000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from benchmarks._common import make_sparse_file, temp_library
+
+import duplicates  # noqa: E402
+import server  # noqa: E402
+
+FOLDER_SIZE = 500
+
+
+def build_library(root: Path, files: int, seed=1):
+    """Write the library. Returns the planted duplicate groups as sets of relative names."""
+    rng = random.Random(seed)
+    names = (f"gen_{i // FOLDER_SIZE:03d}/user_prompt_{i:06d}_{rng.getrandbits(32):08x}.mp4" for i in range(files))
+    planted, used_sizes = [], set()
+
+    def fresh_size():
+        while True:
+            size = rng.randrange(1 << 20, 64 << 20)
+            if size not in used_sizes:
+                used_sizes.add(size)
+                return size
+
+    def write(name, size, marks):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        make_sparse_file(path, size)
+        with open(path, 'r+b') as f:
+            for offset, data in marks:
+                f.seek(offset)
+                f.write(data)
+
+    written = 0
+    while written < files:
+        kind = rng.random()
+        size = fresh_size()
+        if kind < 0.005:
+            # Byte-identical copies
+            copies = [next(names) for _ in range(rng.randint(2, 3))]
+            for name in copies:
+                write(name, size, [(0, b'same')])
+            planted.append(set(copies))
+            written += len(copies)
+        elif kind < 0.015:
+            # Same size, different head: told apart by the sample hash
+            for tag in (b'head-a', b'head-b'):
+                write(next(names), size, [(0, tag)])
+            written += 2
+        elif kind < 0.017:
+            # Same size, same head and tail, different middle: needs the full hash
+            for tag in (b'mid-a', b'mid-b'):
+                write(next(names), size, [(size // 2, tag)])
+            written += 2
+        else:
+            write(next(names), size, [])
+            written += 1
+    return planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=50000)
+    args = parser.parse_args()
+
+    report = {"files": args.files}
+    with temp_library() as tmp:
+        root = Path(tmp)
+        started = time.perf_counter()
+        planted = build_library(root, args.files)
+        report["build_s"] = round(time.perf_counter() - started, 1)
+
+        finder = duplicates.DuplicateFinder()
+        try:
+            for run in ("cold", "cached"):
+                result = finder.find(root, server.MEDIA_EXT, server.IGNORED_DIRS, recursive=True)
+                stats = result["stats"]
+                found = [set(group["files"]) for group in result["groups"]]
+                report[run] = {
+                    **stats,
+                    "read_fraction": round(stats["bytes_read"] / stats["bytes_total"], 6),
+                    "groups_found": len(found),
+                    "groups_planted": len(planted),
+                    "exact": sorted(map(sorted, found)) == sorted(map(sorted, planted)),
+                }
+                print(f"🔍 {run:<6}: {stats['elapsed_ms']} ms, read {stats['bytes_read'] / 1e6:.1f} MB of "
+                      f"{stats['bytes_total'] / 1e9:.1f} GB, {len(found)}/{len(planted)} groups", file=sys.stderr)
+        finally:
+            finder.close()
+
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["cold"]["exact"] and report["cached"]["exact"] else 1)
+
+
+if __name__ == "__main__":
+    main()
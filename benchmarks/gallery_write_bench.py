@@ -0,0 +1,95 @@
+"""
+Peak memory and wall time of writing the gallery (manifest + page) for
+libraries of 10k, 100k and 1M videos, streamed from the scan catalog versus
+written from an in-memory list (the uncached path).
+
+    python -m benchmarks.gallery_write_bench --entries 10000,100000,1000000
+
+Each measurement runs in a fresh process so its peak RSS is its own.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks._common import REPO_DIR, peak_rss_mb, temp_library
+
+import scan_cache  # noqa: E402
+import video_gallery  # noqa: E402
+
+FOLDER_SIZE = 1000  # synthetic videos per folder
+
+
+def build_catalog(root: Path, entries: int):
+    """Fill the scan catalog for root with synthetic videos, a folder at a time."""
+    cache = scan_cache.ScanCache(root)
+    for start in range(0, entries, FOLDER_SIZE):
+        folder = f"batch_{start // FOLDER_SIZE:05d}/"
+        records = [(f"{folder}user_prompt_{i:07d}_a1b2c3d4-e5f6.mp4", 1_000_000 + i, 1.7e9 + i)
+                   for i in range(start, min(start + FOLDER_SIZE, entries))]
+        cache.update({folder: (0, records, [])}, ())
+    cache.close()
+
+
+def measure(root: Path, source: str):
+    """Child process: write the gallery from the catalog and report time and memory."""
+    baseline = peak_rss_mb()
+    cache = scan_cache.ScanCache(root)
+    started = time.perf_counter()
+    if source == 'list':
+        videos = list(video_gallery.cached_videos(cache))
+        video_gallery.write_manifest(videos, root / video_gallery.MANIFEST_FILE)
+    else:
+        video_gallery.write_manifest(video_gallery.cached_videos(cache), root / video_gallery.MANIFEST_FILE,
+                                     cache.count())
+    video_gallery.write_atomic(root / "gallery.html", [video_gallery.generate_html()])
+    elapsed = time.perf_counter() - started
+    cache.close()
+    peak = peak_rss_mb()
+    return {
+        "wall_s": round(elapsed, 3),
+        "peak_rss_mb": peak,
+        "peak_over_baseline_mb": round(peak - baseline, 1) if peak is not None else None,
+        "manifest_mb": round((root / video_gallery.MANIFEST_FILE).stat().st_size / (1 << 20), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', default="10000,100000,1000000", help="comma-separated library sizes")
+    parser.add_argument('--child', choices=['catalog', 'list'], help=argparse.SUPPRESS)
+    parser.add_argument('--root', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        scan_cache.CACHE_DIR = args.cache_dir
+        print(json.dumps(measure(args.root, args.child)))
+        return
+
+    report = []
+    for entries in [int(n) for n in args.entries.split(',')]:
+        with temp_library() as tmp:
+            root, cache_dir = Path(tmp) / "library", Path(tmp) / "cache"
+            root.mkdir()
+            scan_cache.CACHE_DIR = cache_dir
+            build_catalog(root, entries)
+            for source in ('catalog', 'list'):
+                out = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.gallery_write_bench', '--child', source,
+                     '--root', str(root), '--cache-dir', str(cache_dir)],
+                    cwd=REPO_DIR, capture_output=True, text=True, check=True)
+                row = {"entries": entries, "source": source}
+                row.update(json.loads(out.stdout))
+                report.append(row)
+                print(f"📝 {entries:>9} videos from {source:<7}: {row['wall_s']:.2f}s, "
+                      f"peak RSS {row['peak_rss_mb']} MB", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
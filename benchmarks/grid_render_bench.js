@@ -0,0 +1,173 @@
+// Frame cost of the organizer's grid, without a browser.
+//
+// Loads the page script from video-organizer.html into a tiny DOM stand-in
+// that counts DOM writes inside the file grid, fills the listing with
+// synthetic files and times render() for a first paint, arrow-key moves and
+// page flips at each size the page's "per page" menu offers, picked through
+// that menu. Markup assigned through innerHTML isn't parsed; it shows up as
+// innerHTML writes and htmlBytes. Pass another copy of the page to compare
+// versions:
+//
+//     node benchmarks/grid_render_bench.js [video-organizer.html] [--no-layout]
+//
+// With --no-layout, elements report no size, as if the grid were hidden.
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const FILES = 20000;
+const MOVES = 500;
+const FLIPS = 20;
+
+const args = process.argv.slice(2);
+const htmlPath = args.find(a => !a.startsWith('--')) || path.join(__dirname, '..', 'video-organizer.html');
+const layout = !args.includes('--no-layout');
+
+const counts = { created: 0, className: 0, text: 0, innerHTML: 0, htmlBytes: 0, removed: 0 };
+let gridRoot = null;
+
+// Only writes to the grid and the cells under it count; the sidebar, status
+// bar and history are re-rendered the same way by both versions
+function inGrid(node) {
+    for (; node; node = node.parent) if (node === gridRoot) return true;
+    return false;
+}
+function count(node, key, n = 1) {
+    if (inGrid(node)) counts[key] += n;
+}
+
+class Element {
+    constructor(tag) {
+        this.tagName = tag;
+        this.children = [];
+        this.parent = null;
+        this.style = {};
+        this.dataset = {};
+        this._className = '';
+        this._text = '';
+        this._html = '';
+        this.scrollTop = 0;
+        const classes = new Set();
+        this.classList = {
+            add: c => classes.add(c), remove: c => classes.delete(c), contains: c => classes.has(c),
+            toggle: c => (classes.has(c) ? classes.delete(c) : classes.add(c))
+        };
+    }
+    get className() { return this._className; }
+    set className(v) { count(this, 'className'); this._className = v; }
+    get textContent() { return this._text; }
+    set textContent(v) { count(this, 'text'); this._text = v; }
+    get innerHTML() { return this._html; }
+    set innerHTML(v) { count(this, 'innerHTML'); count(this, 'htmlBytes', v.length); this._html = v; this.children = []; }
+    get offsetWidth() { return layout ? 160 : 0; }
+    get offsetHeight() { return layout ? 150 : 0; }
+    get clientWidth() { return layout ? 1200 : 0; }
+    get clientHeight() { return layout ? 800 : 0; }
+    appendChild(child) {
+        this.children.push(child);
+        child.parent = this;
+        count(this, 'created', 1 + descendants(child));
+        return child;
+    }
+    remove() {
+        count(this, 'removed');
+        if (this.parent) this.parent.children.splice(this.parent.children.indexOf(this), 1);
+        this.parent = null;
+    }
+    addEventListener() { }
+    removeEventListener() { }
+    querySelector() { return null; }
+    querySelectorAll() { return []; }
+    closest() { return null; }
+    setAttribute() { }
+    removeAttribute() { }
+    scrollIntoView() { }
+    focus() { }
+    blur() { }
+}
+
+function descendants(node) {
+    return node.children.reduce((n, child) => n + 1 + descendants(child), 0);
+}
+
+// The page sizes offered by the page-size menu
+function pageSizes() {
+    const html = fs.readFileSync(htmlPath, 'utf8');
+    const menu = html.match(/<select id="page-size-select"[\s\S]*?<\/select>/);
+    if (!menu) throw new Error(`${htmlPath} has no page-size menu`);
+    return [...menu[0].matchAll(/<option value="(\d+)"/g)].map(m => Number(m[1]));
+}
+
+function loadPage() {
+    const html = fs.readFileSync(htmlPath, 'utf8');
+    const script = html.match(/<script>([\s\S]*?)<\/script>/)[1];
+    const byId = {};
+    const document = {
+        getElementById: id => byId[id] || (byId[id] = new Element('div')),
+        createElement: tag => new Element(tag),
+        querySelector: () => null,
+        querySelectorAll: () => [],
+        addEventListener() { },
+        body: new Element('body')
+    };
+    const context = {
+        document,
+        console,
+        // The listing is filled in by hand below; the page's own fetches never answer
+        fetch: () => new Promise(() => { }),
+        setTimeout: () => 0,
+        clearTimeout() { },
+        setInterval: () => 0,
+        clearInterval() { },
+        requestAnimationFrame: () => 0,
+        addEventListener() { },
+        performance
+    };
+    context.window = context;
+    vm.createContext(context);
+    vm.runInContext(`${script}\n;globalThis.__page = { state, el, render, handleKey, changePageSize };`, context);
+    gridRoot = byId['file-grid'];
+    return context.__page;
+}
+
+function timed(run) {
+    const before = { ...counts };
+    const started = process.hrtime.bigint();
+    run();
+    const ms = Number(process.hrtime.bigint() - started) / 1e6;
+    const writes = {};
+    for (const key of Object.keys(counts)) writes[key] = counts[key] - before[key];
+    return { ms, writes };
+}
+
+function perStep({ ms, writes }, steps) {
+    const result = { ms: +(ms / steps).toFixed(4) };
+    for (const [key, value] of Object.entries(writes)) result[key] = +(value / steps).toFixed(1);
+    return result;
+}
+
+const report = [];
+for (const pageSize of pageSizes()) {
+    const page = loadPage();
+    const { state } = page;
+    state.files = Array.from({ length: FILES }, (_, i) => `clip_${String(i).padStart(6, '0')}.mp4`);
+    state.selectedIndex = 0;
+    state.isLoading = false;  // the page's first fetch never answers here
+    const key = name => page.handleKey({ key: name, preventDefault() { }, ctrlKey: false, shiftKey: false, metaKey: false });
+
+    page.el.pageSizeSelect.value = String(pageSize);
+    const first = timed(() => page.changePageSize());
+    const moves = timed(() => { for (let i = 0; i < MOVES; i++) key('ArrowRight'); });
+    const flips = timed(() => { for (let i = 0; i < FLIPS; i++) key('PageDown'); });
+    report.push({
+        page_size: pageSize,
+        first_render: perStep(first, 1),
+        arrow_move: perStep(moves, MOVES),
+        page_flip: perStep(flips, FLIPS)
+    });
+    console.error(`▦ page ${String(pageSize).padStart(5)}: first ${first.ms.toFixed(2)} ms, ` +
+        `move ${(moves.ms / MOVES).toFixed(3)} ms, flip ${(flips.ms / FLIPS).toFixed(2)} ms`);
+}
+
+console.log(JSON.stringify({ html: htmlPath, layout, files: FILES, results: report }, null, 2));
@@ -0,0 +1,84 @@
+"""
+Load test for HTTP/1.1 keep-alive: requests/sec for /api/list calls and small
+Range requests, one connection per request (HTTP/1.0) vs persistent connections.
+
+    python -m benchmarks.keepalive_bench --clients 8 --requests 200
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from pathlib import Path
+
+from benchmarks._common import server, make_random_file, temp_library, start_server, stop_server
+
+
+def client(port, requests, persistent, errors):
+    conn = None
+    for i in range(requests):
+        if conn is None:
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+        try:
+            if i % 2:
+                conn.request("POST", "/api/list", body=b"{}", headers={"Content-Type": "application/json"})
+            else:
+                offset = (i * 65536) % (8 << 20)
+                conn.request("GET", "/clip.mp4", headers={"Range": f"bytes={offset}-{offset + 65535}"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.will_close or not persistent:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+
+
+def run(port, clients, requests, persistent):
+    errors = []
+    threads = [threading.Thread(target=client, args=(port, requests, persistent, errors)) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = clients * requests
+    return {
+        "protocol": "HTTP/1.1 keep-alive" if persistent else "HTTP/1.0",
+        "requests": total,
+        "errors": len(errors),
+        "req_per_s": round(total / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    args = parser.parse_args()
+
+    report = []
+    with temp_library() as tmp:
+        make_random_file(Path(tmp) / "clip.mp4", 8 << 20)
+        for i in range(50):
+            (Path(tmp) / f"image_{i}.jpg").touch()
+
+        for protocol in ("HTTP/1.0", "HTTP/1.1"):
+            handler = type("BenchHandler", (server.GalleryRequestHandler,), {"protocol_version": protocol})
+            httpd, port = start_server(Path(tmp), handler_cls=handler)
+            try:
+                report.append(run(port, args.clients, args.requests, protocol == "HTTP/1.1"))
+            finally:
+                stop_server(httpd)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
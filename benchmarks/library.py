@@ -0,0 +1,107 @@
+"""
+Synthetic media libraries for the benchmarks: sparse files (they take no
+disk space) of chosen sizes, named like Midjourney downloads
+(user_prompt_words_<job uuid>_<n>.mp4), with modification times spread
+over a year, part of them in the top folder and the rest in nested
+folders. The same seed always gives the same library.
+
+    python -m benchmarks.library OUT_DIR --videos 35000 --images 5000
+
+makes one to try the organizer or the gallery on by hand.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from benchmarks._common import make_sparse_file
+
+USERS = ("lacarte", "pixelmonk", "neonfox", "studio_k", "dreamweaver", "aurora_ai")
+PROMPT_WORDS = ("a cat astronaut in a neon city cinematic lighting ultra detailed forest spirit dragon "
+                "over the ocean at sunset portrait of a samurai cyberpunk street rain reflections "
+                "lighthouse storm koi pond origami fox vaporwave glacier cathedral bioluminescent "
+                "mushroom nebula steampunk airship slow motion drone shot 35mm film grain").split()
+VIDEO_EXTENSIONS = ('.mp4', '.mp4', '.mp4', '.webm')  # mostly MP4, as downloaded
+IMAGE_EXTENSIONS = ('.png', '.png', '.webp', '.jpg')
+DEFAULT_SIZES_MB = (1, 2, 4, 8, 16, 32)
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+def midjourney_name(rng, ext):
+    """user_prompt_words_<job uuid>_<variant><ext>, the prompt cut to 40-60 characters as Midjourney does."""
+    words = rng.sample(PROMPT_WORDS, rng.randint(4, 12))
+    prompt = '_'.join(words)[:rng.randint(40, 60)].rstrip('_')
+    job = uuid.UUID(int=rng.getrandbits(128), version=4)
+    return f"{rng.choice(USERS)}_{prompt}_{job}_{rng.randint(0, 3)}{ext}"
+
+
+def folder_names(depth, fanout):
+    """Relative paths of the nested folders: fanout months at the top, fanout batches in each, and so on."""
+    level = [f"2024-{m + 1:02d}" for m in range(fanout)]
+    folders = list(level)
+    for d in range(1, depth):
+        level = [f"{parent}/batch_{d}{i}" for parent in level for i in range(fanout)]
+        folders += level
+    return folders
+
+
+def build_library(root: Path, videos, images=0, top_share=0.5, depth=2, fanout=4,
+                  sizes_mb=DEFAULT_SIZES_MB, seed=1):
+    """
+    Write a library under root. top_share of the files go in root itself
+    (the folder the organizer works on), the rest round the nested folders.
+    Returns a description: the files (relative paths), the top-level ones,
+    the folders and the total bytes.
+    """
+    rng = random.Random(seed)
+    folders = folder_names(depth, fanout) if depth > 0 else []
+    for folder in folders:
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    now = time.time()
+
+    kinds = [VIDEO_EXTENSIONS] * videos + [IMAGE_EXTENSIONS] * images
+    rng.shuffle(kinds)
+    files, top, total = [], [], 0
+    for extensions in kinds:
+        name = midjourney_name(rng, rng.choice(extensions))
+        folder = '' if not folders or rng.random() < top_share else rng.choice(folders)
+        relative = f"{folder}/{name}" if folder else name
+        size = rng.choice(sizes_mb) << 20
+        path = make_sparse_file(root / relative, size)
+        mtime = now - rng.random() * YEAR_SECONDS
+        os.utime(path, (mtime, mtime))
+        files.append(relative)
+        if not folder:
+            top.append(relative)
+        total += size
+    return {"files": files, "top_level": top, "folders": folders, "bytes": total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', type=Path)
+    parser.add_argument('--videos', type=int, default=35000)
+    parser.add_argument('--images', type=int, default=0)
+    parser.add_argument('--top-share', type=float, default=0.5, help="share of files in the top folder")
+    parser.add_argument('--depth', type=int, default=2, help="levels of nested folders")
+    parser.add_argument('--fanout', type=int, default=4, help="sub-folders per folder")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES_MB)), help="file sizes to pick from, in MB")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    args.directory.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    library = build_library(args.directory, args.videos, args.images, args.top_share, args.depth, args.fanout,
+                            [int(mb) for mb in args.sizes.split(',')], args.seed)
+    print(f"📚 {len(library['files'])} files ({library['bytes'] / 1e9:.1f} GB apparent, sparse) in "
+          f"{len(library['folders'])} folders, {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    print(json.dumps({key: len(value) if isinstance(value, list) else value for key, value in library.items()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Range request conformance (RFC 7233) for byte_ranges and both backends:
+suffix and open-ended ranges, clamping past EOF, multipart/byteranges
+bodies, ignored and unsatisfiable ranges. Every 206 body is checked byte
+for byte against the file, and the bytes a player-like seek sequence pulls
+over the wire are compared with the bytes it asked for. Concurrent clients
+then fetch overlapping ranges of one file, which the server reads through
+one shared descriptor; the threaded backend is checked again with
+sendfile off, so its copy loop reads that descriptor too.
+
+    python -m benchmarks.range_conformance
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from pathlib import Path
+
+from benchmarks._common import server, temp_library, start_server, stop_server, start_async_server
+
+import byte_ranges  # noqa: E402
+
+SIZE = 1 << 20
+USE_SENDFILE = server.USE_SENDFILE
+
+# Range header -> expected spans (None: send the whole file, 416: not satisfiable)
+PARSE_CASES = [
+    (None, None),
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=100-", [(100, SIZE - 1)]),
+    ("bytes=-65536", [(SIZE - 65536, SIZE - 1)]),
+    ("bytes=-0", 416),
+    (f"bytes=-{SIZE * 2}", [(0, SIZE - 1)]),
+    (f"bytes=0-{SIZE * 2}", [(0, SIZE - 1)]),
+    (f"bytes={SIZE}-", 416),
+    (f"bytes={SIZE - 1}-", [(SIZE - 1, SIZE - 1)]),
+    ("bytes=0-9,20-29", [(0, 9), (20, 29)]),
+    ("bytes=20-29, 0-9", [(0, 9), (20, 29)]),
+    ("bytes=0-9,10-19", [(0, 19)]),
+    ("bytes=0-99,50-149", [(0, 149)]),
+    (f"bytes=0-9,{SIZE}-", [(0, 9)]),
+    ("bytes=0-9,-10", [(0, 9), (SIZE - 10, SIZE - 1)]),
+    ("BYTES=0-9", [(0, 9)]),
+    ("bytes=9-0", None),
+    ("bytes=abc", None),
+    ("bytes=-", None),
+    ("items=0-9", None),
+    ("bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(byte_ranges.MAX_RANGES + 1)), None),
+]
+
+# (Range header, expected status, expected spans for 206)
+HTTP_CASES = [
+    ("bytes=0-99", 206, [(0, 99)]),
+    ("bytes=-65536", 206, [(SIZE - 65536, SIZE - 1)]),
+    (f"bytes=1000-{SIZE * 4}", 206, [(1000, SIZE - 1)]),
+    ("bytes=0-9,500-599,-16", 206, [(0, 9), (500, 599), (SIZE - 16, SIZE - 1)]),
+    ("bytes=0-9,5-19", 206, [(0, 19)]),
+    (f"bytes={SIZE}-", 416, None),
+    ("bytes=9-0", 200, None),
+    ("items=0-9", 200, None),
+]
+
+# A player opening an MP4 with its index at the end, then seeking twice
+# Overlapping ranges fetched at once from one file
+SHARED_SIZE = 8 << 20
+CONCURRENT_CLIENTS = 8
+CONCURRENT_REQUESTS = 30
+CONCURRENT_SPAN = 3 << 20
+PLAYER_SEQUENCE = ["bytes=0-65535", "bytes=-65536", "bytes=400000-465535", "bytes=800000-865535"]
+
+
+def check_parse():
+    failures = []
+    for header, expected in PARSE_CASES:
+        try:
+            got = byte_ranges.parse(header, SIZE)
+        except byte_ranges.RangeNotSatisfiable:
+            got = 416
+        if got != expected:
+            failures.append(f"parse({header!r}): {got}, expected {expected}")
+    return failures
+
+
+def request(port, headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/clip.mp4", headers=headers)
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+def received_spans(resp, body):
+    """[(start, end, bytes)] carried by a 206 response, single part or multipart."""
+    if resp.getheader("Content-Type", "").startswith("multipart/byteranges"):
+        head = f"Content-Type: {resp.getheader('Content-Type')}\r\n\r\n".encode()
+        message = BytesParser(policy=HTTP).parsebytes(head + body)
+        parts = [(part["Content-Range"], part.get_payload(decode=True)) for part in message.iter_parts()]
+    else:
+        parts = [(resp.getheader("Content-Range", ""), body)]
+    spans = []
+    for content_range, data in parts:
+        first, last = content_range.split()[1].split("/")[0].split("-")
+        spans.append((int(first), int(last), data))
+    return spans
+
+
+def check_http(port, data):
+    failures = []
+    for header, status, expected in HTTP_CASES:
+        resp, body = request(port, {"Range": header})
+        label = f"Range: {header}"
+        if resp.status != status:
+            failures.append(f"{label}: status {resp.status}, expected {status}")
+            continue
+        if int(resp.getheader("Content-Length", -1)) != len(body):
+            failures.append(f"{label}: Content-Length {resp.getheader('Content-Length')} != body {len(body)}")
+        if status == 200 and body != data:
+            failures.append(f"{label}: full body differs from the file")
+        elif status == 416 and resp.getheader("Content-Range") != f"bytes */{SIZE}":
+            failures.append(f"{label}: Content-Range {resp.getheader('Content-Range')!r}")
+        elif status == 206:
+            spans = received_spans(resp, body)
+            if [(s, e) for s, e, _ in spans] != expected:
+                failures.append(f"{label}: spans {[(s, e) for s, e, _ in spans]}, expected {expected}")
+            for start, end, chunk in spans:
+                if chunk != data[start:end + 1]:
+                    failures.append(f"{label}: bytes {start}-{end} differ from the file")
+    return failures
+
+
+def check_concurrent(port, shared):
+    """Clients fetching overlapping ranges of shared.mp4 at once: every body must match the file."""
+    failures = []
+
+    def client(n):
+        rng = random.Random(n)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        for _ in range(CONCURRENT_REQUESTS):
+            start = rng.randrange(0, SHARED_SIZE - CONCURRENT_SPAN)
+            end = start + CONCURRENT_SPAN - 1
+            try:
+                conn.request("GET", "/shared.mp4", headers={"Range": f"bytes={start}-{end}"})
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                failures.append(f"bytes {start}-{end}: {type(e).__name__}")
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            if resp.status != 206 or body != shared[start:end + 1]:
+                failures.append(f"bytes {start}-{end}: status {resp.status}, body differs from the file")
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(CONCURRENT_CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if failures:
+        return [f"{len(failures)} of {CONCURRENT_CLIENTS * CONCURRENT_REQUESTS} concurrent ranges wrong, "
+                f"first: {failures[0]}"]
+    return []
+
+
+def without_sendfile(start):
+    """Start a backend with server.USE_SENDFILE off until it is stopped."""
+    def started():
+        server.USE_SENDFILE = False
+        handle, port = start()
+
+        def stop():
+            stop_server(handle)
+            server.USE_SENDFILE = USE_SENDFILE
+        return stop, port
+    return started
+
+
+def over_fetch(port):
+    """Bytes of body received for PLAYER_SEQUENCE, against the bytes it asked for."""
+    wanted = received = 0
+    for header in PLAYER_SEQUENCE:
+        (start, end), = byte_ranges.parse(header, SIZE)
+        wanted += end - start + 1
+        _, body = request(port, {"Range": header})
+        received += len(body)
+    return {"bytes_requested": wanted, "bytes_received": received}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args()
+
+    failures = [("parse", f) for f in check_parse()]
+    report = []
+    with temp_library() as tmp:
+        root = Path(tmp)
+        data = os.urandom(SIZE)
+        (root / "clip.mp4").write_bytes(data)
+        shared = os.urandom(SHARED_SIZE)
+        (root / "shared.mp4").write_bytes(shared)
+        start_threads = lambda: start_server(root, server_cls=server.PooledHTTPServer)  # noqa: E731
+        backends = [
+            ("threads", start_threads),
+            ("threads, no sendfile", without_sendfile(start_threads)),
+            ("asyncio", lambda: start_async_server(root)),
+        ]
+        for name, start in backends:
+            handle, port = start()
+            try:
+                failures += [(name, f) for f in check_http(port, data)]
+                failures += [(name, f) for f in check_concurrent(port, shared)]
+                report.append({"backend": name, **over_fetch(port)})
+            finally:
+                handle() if callable(handle) else stop_server(handle)
+
+    for where, failure in failures:
+        print(f"❌ [{where}] {failure}")
+    print(json.dumps({"failures": len(failures), "player_sequence": report}, indent=2))
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Filename search over synthetic prompt-style names: time to build the
+trigram index, query latency (median and worst of several runs) for rare,
+common, multi-word, typo and one-letter queries, and the cost of keeping
+the index current as files are moved out and back in.
+
+    python -m benchmarks.search_bench --names 100000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import benchmarks._common  # noqa: F401  (puts the repository on sys.path)
+from search_index import SearchIndex  # noqa: E402
+
+WORDS = ("cat astronaut neon city forest dragon sunset portrait cyberpunk ocean robot castle "
+         "anime girl samurai desert storm lighthouse jellyfish cathedral glacier tiger koi "
+         "steampunk bioluminescent mushroom nebula vaporwave origami fox").split()
+QUERIES = {
+    "rare": "jellyfish_koi",
+    "common": "cat",
+    "words": "neon city",
+    "typo": "lighthuose",
+    "short": "x",
+}
+RUNS = 7
+
+
+def make_names(count, seed=1):
+    rng = random.Random(seed)
+    return [f"{rng.choice(['user', 'artist', 'studio'])}_{'_'.join(rng.sample(WORDS, rng.randint(2, 5)))}"
+            f"_{rng.getrandbits(128):032x}.{rng.choice(['mp4', 'mp4', 'webm', 'png'])}" for _ in range(count)]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--names', type=int, default=100000)
+    args = parser.parse_args()
+
+    names = make_names(args.names)
+    index, build_ms = timed(SearchIndex, names)
+    report = {"names": args.names, "build_ms": round(build_ms), "queries": {}}
+    print(f"🔎 Built index of {args.names} names in {build_ms:.0f} ms", file=sys.stderr)
+
+    for label, query in QUERIES.items():
+        times = []
+        for _ in range(RUNS):
+            index.results.clear()  # Time the ranking, not the result cache
+            (total, page), ms = timed(index.search, query, 0, 50)
+            times.append(ms)
+        _, cached_ms = timed(index.search, query, 50, 50)
+        report["queries"][label] = {
+            "query": query,
+            "total": total,
+            "fuzzy": sum(1 for _, match, _ in page if match == 'fuzzy'),
+            "median_ms": round(statistics.median(times), 2),
+            "max_ms": round(max(times), 2),
+            "next_page_ms": round(cached_ms, 3),
+        }
+        print(f"   {label:<7} {query!r:<16} {total:>6} matches, {statistics.median(times):.2f} ms", file=sys.stderr)
+
+    moved = random.Random(2).sample(names, min(1000, len(names)))
+    _, out_ms = timed(index.update, (), moved)
+    _, back_ms = timed(index.update, moved, ())
+    report["update_1000"] = {"removed_ms": round(out_ms, 2), "added_ms": round(back_ms, 2)}
+    report["consistent"] = index.search(moved[0], 0, 1)[1][:1] == [(moved[0], 'substring', 1.0)]
+
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["consistent"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare media streaming throughput and CPU cost with and without os.sendfile.
+
+    python -m benchmarks.sendfile_bench --size-mb 256 --streams 4
+
+Server and clients share one process, so the CPU figures include the client
+side too; the client reads into a preallocated buffer and costs the same in
+both modes, so the difference between the rows is the server's copy cost.
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from pathlib import Path
+
+from benchmarks._common import server, make_random_file, temp_library, start_server, stop_server
+
+
+def fetch(port, path, range_header=None):
+    """GET path over a raw socket and return the number of body bytes received."""
+    sock = socket.create_connection(("127.0.0.1", port))
+    headers = f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n"
+    if range_header:
+        headers += f"Range: {range_header}\r\n"
+    sock.sendall((headers + "\r\n").encode('ascii'))
+
+    buf = bytearray(1 << 20)
+    view = memoryview(buf)
+    total = 0
+    header_done = False
+    head = b""
+    while True:
+        n = sock.recv_into(view)
+        if not n:
+            break
+        if not header_done:
+            head += bytes(view[:n])
+            if b"\r\n\r\n" in head:
+                header_done = True
+                total += len(head) - head.index(b"\r\n\r\n") - 4
+            continue
+        total += n
+    sock.close()
+    return total
+
+
+def run(port, name, size, streams, ranged):
+    range_header = f"bytes=0-{size - 1}" if ranged else None
+    results = []
+
+    def worker():
+        results.append(fetch(port, "/" + name, range_header))
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(streams)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    total_mb = sum(results) / (1 << 20)
+    return {
+        "ranged": ranged,
+        "streams": streams,
+        "mb": round(total_mb, 1),
+        "mb_per_s": round(total_mb / wall, 1),
+        "cpu_s_per_stream": round(cpu / streams, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--streams', type=int, default=4)
+    args = parser.parse_args()
+
+    size = args.size_mb << 20
+    report = []
+    with temp_library() as tmp:
+        make_random_file(Path(tmp) / "bench.mp4", size)
+        httpd, port = start_server(Path(tmp))
+        try:
+            fetch(port, "/bench.mp4")  # warm the page cache
+            for use_sendfile in ([True, False] if hasattr(server.os, 'sendfile') else [False]):
+                server.USE_SENDFILE = use_sendfile
+                for ranged in (False, True):
+                    row = run(port, "bench.mp4", size, args.streams, ranged)
+                    row["sendfile"] = use_sendfile
+                    report.append(row)
+        finally:
+            stop_server(httpd)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+End-to-end benchmark on a synthetic library (see benchmarks.library), for
+tracking regressions between releases. Reports as JSON:
+
+- gallery: get_video_files over the whole library, then writing the
+  manifest and generate_html's page: time of each and peak memory, in a
+  child process so the peak is the gallery's own.
+- list: /api/list latency for the full listing and for windows sorted by
+  date, with the first call (which builds the index) reported apart.
+- move_delete: latency of moving a file into a folder and back, and of
+  deleting it and restoring it from the trash.
+- range: concurrent clients fetching Range chunks at random offsets over
+  keep-alive connections: MB/s, requests/s and latency.
+
+    python -m benchmarks.suite --videos 35000 --output results.json
+    python -m benchmarks.suite --videos 2000 --only list,range
+"""
+
+import argparse
+import contextlib
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+from benchmarks._common import (REPO_DIR, latency_summary, peak_rss_mb, server, start_server, stop_server,
+                                temp_library)
+from benchmarks.library import build_library
+
+import scan_cache  # noqa: E402
+import video_gallery  # noqa: E402
+
+STAGES = ('gallery', 'list', 'move_delete', 'range')
+LIST_WINDOW = 60  # files per /api/list window, three pages of the organizer's grid
+
+
+def measure_gallery(root: Path, out: Path):
+    """Child process: scan root and write its gallery into out."""
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    videos = video_gallery.get_video_files(root, recursive=True)
+    scanned = time.perf_counter()
+    video_gallery.write_manifest(videos, out / video_gallery.MANIFEST_FILE)
+    written = time.perf_counter()
+    video_gallery.write_atomic(out / "gallery.html", [video_gallery.generate_html()])
+    finished = time.perf_counter()
+    peak = peak_rss_mb()
+    return {
+        "videos": len(videos),
+        "get_video_files_s": round(scanned - started, 3),
+        "write_manifest_s": round(written - scanned, 3),
+        "generate_html_s": round(finished - written, 3),
+        "total_s": round(finished - started, 3),
+        "peak_rss_mb": peak,
+        "peak_over_baseline_mb": round(peak - baseline, 1) if peak is not None else None,
+        "manifest_mb": round((out / video_gallery.MANIFEST_FILE).stat().st_size / (1 << 20), 2),
+    }
+
+
+def run_gallery(root: Path, out: Path):
+    out.mkdir(exist_ok=True)
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', '--child', 'gallery', '--root', str(root), '--out', str(out)],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def post(conn, path, body):
+    """POST JSON on a kept-alive connection. Returns (status, parsed body, seconds)."""
+    started = time.perf_counter()
+    conn.request("POST", path, body=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    data = resp.read()
+    elapsed = time.perf_counter() - started
+    return resp.status, json.loads(data) if resp.status == 200 else data, elapsed
+
+
+def run_list(port, requests, rng):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        status, data, cold = post(conn, "/api/list", {})
+        if status != 200:
+            raise RuntimeError(f"/api/list failed: {status}")
+        total = len(data["files"])
+        full, window = [], []
+        for _ in range(requests):
+            full.append(post(conn, "/api/list", {})[2])
+        for _ in range(requests):
+            offset = rng.randrange(0, max(1, total - LIST_WINDOW))
+            status, _, seconds = post(conn, "/api/list", {"offset": offset, "limit": LIST_WINDOW,
+                                                          "sort": "mtime", "order": "desc"})
+            window.append(seconds)
+        return {
+            "files_listed": total,
+            "cold_ms": round(cold * 1000, 3),
+            "full": latency_summary(full),
+            "window": latency_summary(window),
+        }
+    finally:
+        conn.close()
+
+
+def run_move_delete(root: Path, port, library, rounds, rng):
+    names = rng.sample(library["top_level"], min(rounds, len(library["top_level"])))
+    folder = library["folders"][0] if library["folders"] else "bench-target"
+    steps = {"move": [], "move_back": [], "delete": [], "restore": []}
+    errors = 0
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        for name in names:
+            for step, path, body in (
+                ("move", "/api/move", {"filename": name, "target": folder}),
+                ("move_back", "/api/move", {"filename": f"{folder}/{name}", "target": "."}),
+                ("delete", "/api/delete", {"filename": name}),
+                ("restore", "/api/move", {"filename": f"trash/{name}", "target": "."}),
+            ):
+                status, _, seconds = post(conn, path, body)
+                errors += status != 200
+                steps[step].append(seconds)
+        # Every file should be back where it started, and listed there
+        status, data, _ = post(conn, "/api/list", {})
+        listed = set(data["files"]) if status == 200 else set()
+    finally:
+        conn.close()
+    round_trips = [sum(times) for times in zip(*steps.values())]
+    return {
+        "rounds": len(names),
+        "errors": errors,
+        "consistent": all((root / name).exists() and name in listed for name in names),
+        "round_trip": latency_summary(round_trips),
+        **{step: latency_summary(times) for step, times in steps.items()},
+    }
+
+
+def run_range(root: Path, port, library, clients, requests, chunk, seed):
+    sample = random.Random(seed).sample(library["files"], min(200, len(library["files"])))
+    targets = [(urllib.parse.quote(name), (root / name).stat().st_size) for name in sample]
+    targets = [(path, size) for path, size in targets if size > chunk]
+    latencies, errors, received = [], [], []
+    start = threading.Barrier(clients + 1)
+
+    def client(n):
+        rng = random.Random(seed + n)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        got, times = 0, []
+        start.wait()
+        for _ in range(requests):
+            path, size = rng.choice(targets)
+            offset = rng.randrange(0, size - chunk)
+            try:
+                started = time.perf_counter()
+                conn.request("GET", f"/{path}", headers={"Range": f"bytes={offset}-{offset + chunk - 1}"})
+                resp = conn.getresponse()
+                body = resp.read()
+                times.append(time.perf_counter() - started)
+                if resp.status != 206 or len(body) != chunk:
+                    errors.append(resp.status)
+                got += len(body)
+                if resp.will_close:
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(type(e).__name__)
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.close()
+        latencies.extend(times)
+        received.append(got)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    start.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "clients": clients,
+        "requests": clients * requests,
+        "chunk_bytes": chunk,
+        "errors": len(errors),
+        "mb_per_s": round(sum(received) / elapsed / 1e6, 1),
+        "req_per_s": round(clients * requests / elapsed, 1),
+        "latency": latency_summary(latencies),
+    }
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ('child', 'root', 'out', 'output') and value is not None},
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--videos', type=int, default=35000)
+    parser.add_argument('--images', type=int, default=0)
+    parser.add_argument('--top-share', type=float, default=0.5, help="share of files in the served folder itself")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', default=','.join(STAGES), help=f"comma-separated stages of {', '.join(STAGES)}")
+    parser.add_argument('--list-requests', type=int, default=50, help="of each kind of /api/list call")
+    parser.add_argument('--rounds', type=int, default=50, help="move/delete round trips")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent Range clients")
+    parser.add_argument('--range-requests', type=int, default=100, help="per Range client")
+    parser.add_argument('--chunk-kb', type=int, default=1024, help="size of each Range request")
+    parser.add_argument('--output', type=Path, help="also write the JSON report here")
+    parser.add_argument('--child', choices=['gallery'], help=argparse.SUPPRESS)
+    parser.add_argument('--root', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--out', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    unknown = set(args.only.split(',')) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure_gallery(args.root, args.out)))
+        return
+
+    stages = args.only.split(',')
+    report = {"environment": environment(args)}
+    with temp_library() as tmp:
+        root = Path(tmp) / "library"
+        root.mkdir()
+        scan_cache.CACHE_DIR = Path(tmp) / "scans"  # The server's media info catalog
+
+        started = time.perf_counter()
+        library = build_library(root, args.videos, args.images, args.top_share, seed=args.seed)
+        report["library"] = {
+            "files": len(library["files"]),
+            "top_level": len(library["top_level"]),
+            "folders": len(library["folders"]),
+            "bytes": library["bytes"],
+            "build_s": round(time.perf_counter() - started, 1),
+        }
+        print(f"📚 Library: {len(library['files'])} files, {len(library['top_level'])} in the top folder "
+              f"({report['library']['build_s']}s to build)", file=sys.stderr)
+
+        if 'gallery' in stages:
+            report["gallery"] = run_gallery(root, Path(tmp) / "gallery")
+            print(f"📝 Gallery: {report['gallery']['total_s']}s, peak RSS {report['gallery']['peak_rss_mb']} MB",
+                  file=sys.stderr)
+
+        if {'list', 'move_delete', 'range'} & set(stages):
+            cwd = os.getcwd()
+            rng = random.Random(args.seed)
+            # The server logs every move to stdout, which carries the report
+            with contextlib.redirect_stdout(sys.stderr):
+                httpd, port = start_server(root, server.PooledHTTPServer)
+                try:
+                    if 'list' in stages:
+                        report["list"] = run_list(port, args.list_requests, rng)
+                        print(f"📃 /api/list: cold {report['list']['cold_ms']} ms, "
+                              f"full p50 {report['list']['full']['p50_ms']} ms, "
+                              f"window p50 {report['list']['window']['p50_ms']} ms", file=sys.stderr)
+                    if 'move_delete' in stages:
+                        report["move_delete"] = run_move_delete(root, port, library, args.rounds, rng)
+                        print(f"📂 Move/delete round trip: p50 {report['move_delete']['round_trip'].get('p50_ms')} ms",
+                              file=sys.stderr)
+                    if 'range' in stages:
+                        report["range"] = run_range(root, port, library, args.clients, args.range_requests,
+                                                    args.chunk_kb << 10, args.seed)
+                        print(f"🎞️ Range: {report['range']['mb_per_s']} MB/s, {report['range']['req_per_s']} req/s "
+                              f"with {args.clients} clients", file=sys.stderr)
+                finally:
+                    stop_server(httpd)
+                    server.close_services()
+                    os.chdir(cwd)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + '\n', encoding='utf-8')
+    failed = any(report.get(stage, {}).get("errors") for stage in ('move_delete', 'range'))
+    failed = failed or report.get("move_delete", {}).get("consistent") is False
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Byte range requests (RFC 7233), shared by both serving backends.
+
+parse() turns a Range header into the list of spans to send: first-last
+ranges, open-ended ranges (`500-`) and suffix ranges (`-65536`, the last
+bytes of the file, which players use to read an MP4 index stored at the
+end), with ends clamped to the file. Several ranges in one request are
+sorted and merged where they touch, and sent as a multipart/byteranges
+body (see Multipart).
+"""
+
+import re
+import uuid
+
+MAX_RANGES = 32  # more ranges than this in one request and the Range is ignored
+RANGE_SPEC = re.compile(r'(\d*)-(\d*)')
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlaps the file (answer 416)."""
+
+
+def parse(header, size):
+    """
+    Resolve a Range header against a file of `size` bytes. Returns a list of
+    (start, end) spans, inclusive, sorted and merged, or None when the whole
+    file should be sent instead (no header, another unit, a malformed or
+    overlong range set). Raises RangeNotSatisfiable if it names no byte of
+    the file.
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+    specs = [spec.strip() for spec in specs.split(',') if spec.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    spans = []
+    for spec in specs:
+        match = RANGE_SPEC.fullmatch(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length > 0 and size > 0:
+                spans.append((max(0, size - length), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None  # Invalid spec: the whole header is ignored
+        if start < size:
+            spans.append((start, min(int(last), size - 1) if last else size - 1))
+
+    if not spans:
+        raise RangeNotSatisfiable(f"bytes */{size}")
+    return merge(spans)
+
+
+def merge(spans):
+    """Sort spans and join those that overlap or touch."""
+    spans = sorted(spans)
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def content_range(start, end, size):
+    return f"bytes {start}-{end}/{size}"
+
+
+class Multipart:
+    """
+    Layout of a multipart/byteranges body: `parts` is a list of (part
+    header bytes, start, count) to send in order, followed by `tail`.
+    """
+
+    def __init__(self, spans, size, content_type):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/byteranges; boundary={self.boundary}"
+        self.parts = []
+        for start, end in spans:
+            head = (f"\r\n--{self.boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: {content_range(start, end, size)}\r\n\r\n")
+            self.parts.append((head.encode('latin-1'), start, end - start + 1))
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode('latin-1')
+        self.length = sum(len(head) + count for head, _, count in self.parts) + len(self.tail)
+
+    def segments(self):
+        """The body as a sequence of bytes and (start, count) file spans."""
+        for head, start, count in self.parts:
+            yield head
+            yield start, count
+        yield self.tail
@@ -0,0 +1,425 @@
+"""
+In-memory index of the served directory.
+
+Built once with os.scandir, then kept up to date incrementally: by inotify
+on Linux, by polling the directory's mtime elsewhere, and directly by the
+API whenever it moves or deletes a file. /api/list is answered from the
+cached snapshot without touching the filesystem. Media info (duration,
+resolution, codec, frame rate) is filled in by a MediaInfoScanner as files
+are probed, so listings can also be sorted and filtered by it.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+
+POLL_INTERVAL = 2.0  # seconds between directory mtime checks in the polling fallback
+HISTORY_LIMIT = 1000  # generations of changes kept for delta listings
+
+# Sort orders for windowed listings: name -> key(name, (size, mtime), info)
+SORT_KEYS = {
+    'name': lambda item: item[0],
+    'mtime': lambda item: (item[1][1], item[0]),
+    'size': lambda item: (item[1][0], item[0]),
+    'duration': lambda item: (item[2]['duration'], item[0]),
+    'resolution': lambda item: (item[2]['width'] * item[2]['height'], item[0]),
+    'fps': lambda item: (item[2]['fps'], item[0]),
+}
+# Media info a sort needs; files without it (not probed yet, images) come last, by name
+SORT_FIELDS = {'duration': ('duration',), 'resolution': ('width', 'height'), 'fps': ('fps',)}
+
+ORIENTATIONS = ('portrait', 'landscape', 'square')
+
+
+def orientation(info):
+    width, height = info.get('width'), info.get('height')
+    if not width or not height:
+        return None
+    return 'portrait' if height > width else 'landscape' if width > height else 'square'
+
+
+# Listing filters on media info: name -> test(info, value). Files without the info never match.
+INFO_FILTERS = {
+    'orientation': lambda info, value: orientation(info) == value,
+    'min_duration': lambda info, value: info.get('duration') is not None and info['duration'] >= value,
+    'max_duration': lambda info, value: info.get('duration') is not None and info['duration'] <= value,
+    'codec': lambda info, value: info.get('codec') in value,
+}
+
+
+class DirectoryIndex:
+    """Media files and sub-folders directly inside root."""
+
+    def __init__(self, root, media_ext, ignored_dirs, shortcuts=None):
+        self.root = Path(root).resolve()
+        self.media_ext = media_ext
+        self.ignored_dirs = ignored_dirs
+        self.assign_shortcuts = shortcuts or (lambda names: {})
+        self.lock = threading.RLock()
+        self.files = {}   # name -> (size, mtime)
+        self.info = {}    # name -> media info ({field: value}), for probed files
+        self.listeners = []  # called with (names added or changed, names removed), lock held
+        self.dirs = set()
+        self.shortcuts = {}
+        self.generation = 0
+        # Identifies this index instance; generations from another one are meaningless
+        self.epoch = os.urandom(4).hex()
+        self.history = deque(maxlen=HISTORY_LIMIT)  # (generation, added, removed, dirs_changed)
+        self.root_mtime = None
+        self.snapshot_cache = None
+        self.views = {}  # (sort, reverse, extensions) -> sorted names, until the next change
+        self.watcher = None
+        self.rescan()
+        self.history.clear()  # The initial build is not a delta anyone can ask for
+
+    # --- Classification ---
+
+    def classify(self, entry):
+        """Return ('file', (size, mtime)), ('dir', None) or None for a DirEntry."""
+        name = entry.name
+        if name.startswith('.'):
+            return None
+        try:
+            if entry.is_dir():
+                if name in self.ignored_dirs:
+                    return None
+                return 'dir', None
+            if entry.is_file() and os.path.splitext(name)[1].lower() in self.media_ext:
+                st = entry.stat()
+                return 'file', (st.st_size, st.st_mtime)
+        except OSError:
+            pass
+        return None
+
+    # --- Updates ---
+
+    def rescan(self):
+        """Full scan of root, applied as a diff against the current index."""
+        files, dirs = {}, set()
+        # Taken before scanning so a change made mid-scan still looks new to the poller
+        self.root_mtime = os.stat(self.root).st_mtime_ns
+        with os.scandir(self.root) as it:
+            for entry in it:
+                kind = self.classify(entry)
+                if kind is None:
+                    continue
+                if kind[0] == 'file':
+                    files[entry.name] = kind[1]
+                else:
+                    dirs.add(entry.name)
+
+        with self.lock:
+            if files == self.files and dirs == self.dirs:
+                return False
+            added = files.keys() - self.files.keys()
+            removed = self.files.keys() - files.keys()
+            modified = [n for n in files.keys() & self.files.keys() if files[n] != self.files[n]]
+            dirs_changed = self.set_dirs(dirs)
+            self.files = files
+            self.changed(added, removed, dirs_changed, modified)
+            return True
+
+    def refresh(self, name):
+        """Re-check a single entry of root after it was created, changed or removed."""
+        name = str(name).replace('\\', '/')
+        if '/' in name.strip('/'):
+            return  # Not directly inside root
+        name = name.strip('/')
+        if not name or name == '.':
+            return
+
+        try:
+            kind = self.classify(_StatEntry(name, os.stat(self.root / name)))
+        except OSError:
+            kind = None
+
+        with self.lock:
+            before = self.files.get(name)
+            dirs_changed = False
+            if kind is None:
+                self.files.pop(name, None)
+                dirs_changed = self.set_dirs(self.dirs - {name})
+            elif kind[0] == 'file':
+                self.files[name] = kind[1]
+            else:
+                dirs_changed = self.set_dirs(self.dirs | {name})
+
+            after = self.files.get(name)
+            if after != before or dirs_changed:
+                added = [name] if before is None and after is not None else []
+                removed = [name] if before is not None and after is None else []
+                modified = [name] if before is not None and after is not None and after != before else []
+                self.changed(added, removed, dirs_changed, modified)
+
+    def set_dirs(self, dirs):
+        """Replace the folder set, re-assigning shortcuts only when it actually changed."""
+        if dirs == self.dirs:
+            return False
+        self.dirs = set(dirs)
+        self.shortcuts = self.assign_shortcuts(sorted(self.dirs))
+        return True
+
+    def changed(self, added=(), removed=(), dirs_changed=False, modified=()):
+        """Start a new generation and remember what it added and removed."""
+        self.generation += 1
+        self.history.append((self.generation, tuple(added), tuple(removed), dirs_changed))
+        self.snapshot_cache = None
+        self.views = {}
+        for name in (*removed, *modified):
+            self.info.pop(name, None)
+        if added or removed or modified:
+            for listener in self.listeners:
+                listener([*added, *modified], list(removed))
+
+    def set_info(self, infos):
+        """
+        Record media info for files ({name: info}). Only views sorted or
+        filtered by media info are dropped; name, date and size views stay.
+        """
+        with self.lock:
+            self.info.update(infos)
+            self.views = {key: names for key, names in self.views.items()
+                          if key[0] not in SORT_FIELDS and not key[3]}
+
+    # --- Queries ---
+
+    def snapshot(self):
+        """The /api/list payload, rebuilt only after the index changed."""
+        with self.lock:
+            if self.snapshot_cache is None:
+                self.snapshot_cache = {
+                    "epoch": self.epoch,
+                    "generation": self.generation,
+                    "delta": False,
+                    "files": sorted(self.files),
+                    "dirs": self.dir_list(),
+                    "cwd": str(self.root),
+                }
+            return self.snapshot_cache
+
+    def view(self, sort='name', reverse=False, extensions=None, filters=()):
+        """
+        File names in the given order, optionally limited to some extensions
+        and to files whose media info passes filters ((name, value) pairs
+        from INFO_FILTERS).
+        """
+        key = (sort, reverse, extensions, filters)
+        with self.lock:
+            names = self.views.get(key)
+            if names is None:
+                items = [(n, v, self.info.get(n, {})) for n, v in self.files.items()]
+                if extensions:
+                    items = [item for item in items if os.path.splitext(item[0])[1].lower() in extensions]
+                for name, value in filters:
+                    test = INFO_FILTERS[name]
+                    items = [item for item in items if test(item[2], value)]
+                fields = SORT_FIELDS.get(sort, ())
+                known = [item for item in items if all(item[2].get(f) is not None for f in fields)]
+                unknown = [item[0] for item in items if any(item[2].get(f) is None for f in fields)]
+                names = [n for n, _, _ in sorted(known, key=SORT_KEYS[sort], reverse=reverse)]
+                names += sorted(unknown)
+                self.views[key] = names
+            return names
+
+    def window(self, offset, limit, sort='name', reverse=False, extensions=None, filters=()):
+        """One page of a sorted, filtered view plus the total count, with the page's media info."""
+        with self.lock:
+            names = self.view(sort, reverse, extensions, filters)
+            page = names[offset:offset + limit]
+            return {
+                "epoch": self.epoch,
+                "generation": self.generation,
+                "delta": False,
+                "total": len(names),
+                "offset": offset,
+                "files": page,
+                "info": {name: self.info[name] for name in page if name in self.info},
+                "dirs": self.dir_list(),
+                "cwd": str(self.root),
+            }
+
+    def dir_list(self):
+        return [{"name": name, "shortcut": self.shortcuts.get(name)} for name in sorted(self.dirs)]
+
+    def changes_since(self, since, epoch=None):
+        """
+        Files added and removed since generation `since`, or the full
+        snapshot when that generation is unknown or its history was pruned.
+        'dirs' is only included in a delta when the folders changed.
+        """
+        with self.lock:
+            if epoch != self.epoch or not isinstance(since, int) or since > self.generation:
+                return self.snapshot()
+            if since < self.generation and (not self.history or since < self.history[0][0] - 1):
+                return self.snapshot()
+
+            initially, now = {}, {}
+            dirs_changed = False
+            for generation, added, removed, changed_dirs in self.history:
+                if generation <= since:
+                    continue
+                for name in removed:
+                    initially.setdefault(name, True)
+                    now[name] = False
+                for name in added:
+                    initially.setdefault(name, False)
+                    now[name] = True
+                dirs_changed = dirs_changed or changed_dirs
+
+            result = {
+                "epoch": self.epoch,
+                "generation": self.generation,
+                "delta": True,
+                "added": sorted(n for n, exists in now.items() if exists and not initially[n]),
+                "removed": sorted(n for n, exists in now.items() if not exists and initially[n]),
+                "cwd": str(self.root),
+            }
+            if dirs_changed:
+                result["dirs"] = self.dir_list()
+            return result
+
+    # --- Watching ---
+
+    def watch(self):
+        """Start a background watcher: inotify where available, mtime polling otherwise."""
+        if self.watcher is None:
+            self.watcher = InotifyWatcher.create(self) or PollingWatcher(self)
+            self.watcher.start()
+            # Catch anything that changed between the first scan and the watch
+            self.rescan()
+        return self.watcher
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+
+class _StatEntry:
+    """Just enough of os.DirEntry for classify() on a single path."""
+
+    def __init__(self, name, st):
+        self.name = name
+        self._stat = st
+
+    def is_dir(self):
+        return stat.S_ISDIR(self._stat.st_mode)
+
+    def is_file(self):
+        return stat.S_ISREG(self._stat.st_mode)
+
+    def stat(self):
+        return self._stat
+
+
+class PollingWatcher(threading.Thread):
+    """Rescans root whenever its mtime changes. One stat per interval otherwise."""
+
+    def __init__(self, index, interval=POLL_INTERVAL):
+        super().__init__(name="dir-index-poll", daemon=True)
+        self.index = index
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if os.stat(self.index.root).st_mtime_ns != self.index.root_mtime:
+                    self.index.rescan()
+            except OSError:
+                pass
+
+    def stop(self):
+        self.stopped.set()
+
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher(threading.Thread):
+    """Applies per-entry inotify events to the index (Linux only)."""
+
+    @classmethod
+    def create(cls, index):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return None
+            wd = libc.inotify_add_watch(fd, os.fsencode(str(index.root)), WATCH_MASK)
+            if wd < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return cls(index, fd)
+
+    def __init__(self, index, fd):
+        super().__init__(name="dir-index-inotify", daemon=True)
+        self.index = index
+        self.fd = fd
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                ready, _, _ = select.select([self.fd], [], [], 1.0)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self.fd, 65536)
+                except BlockingIOError:
+                    continue
+                self.apply(data)
+        finally:
+            os.close(self.fd)
+
+    def apply(self, data):
+        names = set()
+        rescan = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                rescan = True
+            elif name:
+                names.add(os.fsdecode(name))
+
+        try:
+            if rescan:
+                self.index.rescan()
+            else:
+                for name in names:
+                    self.index.refresh(name)
+        except OSError:
+            pass
+
+    def stop(self):
+        self.stopped.set()
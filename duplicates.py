@@ -0,0 +1,158 @@
+"""
+Byte-identical copies among the served media files.
+
+Re-downloads of the same generation pile up under different names. Finding
+them reads as little as possible, in three stages:
+
+1. Files are grouped by size; a file with a size of its own has no copy.
+2. Files that share a size are hashed on their first and last
+   SAMPLE_BYTES. Files small enough to be read whole here are done.
+3. Only files whose samples still collide are hashed in full.
+
+Hashing runs on a thread pool (hashlib releases the GIL on large buffers,
+so several files hash at once) reading READ_SIZE chunks into one reused
+buffer. Plain reads rather than mmap, since a mapped file can't be renamed
+or deleted on Windows while the organizer wants to trash it. Digests are
+remembered by (path, size, mtime), so a repeat scan only reads files that
+are new or changed.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_BYTES = 64 * 1024  # read from each end of a file for the quick hash
+READ_SIZE = 1024 * 1024
+HASH_WORKERS = min(8, os.cpu_count() or 4)
+MAX_CACHED = 200_000  # digests remembered, least recently used dropped first
+
+
+def media_files(root, media_ext, ignored_dirs, recursive=False):
+    """(name relative to root, path, size, mtime_ns) of the media files under root."""
+    folders = [('', str(root))]
+    while folders:
+        prefix, folder = folders.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and entry.name not in ignored_dirs:
+                        folders.append((f"{prefix}{entry.name}/", entry.path))
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in media_ext:
+                    st = entry.stat()
+                    yield f"{prefix}{entry.name}", entry.path, st.st_size, st.st_mtime_ns
+            except OSError:
+                continue
+
+
+def file_digest(path, spans):
+    """blake2b of the given (offset, length) spans of a file. Returns (hex digest, bytes read)."""
+    h = hashlib.blake2b(digest_size=16)
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    read = 0
+    with open(path, 'rb', buffering=0) as f:
+        for offset, length in spans:
+            f.seek(offset)
+            while length > 0:
+                n = f.readinto(view[:min(length, READ_SIZE)])
+                if not n:
+                    break
+                h.update(view[:n])
+                read += n
+                length -= n
+    return h.hexdigest(), read
+
+
+def sample_spans(size):
+    if size <= 2 * SAMPLE_BYTES:
+        return [(0, size)]
+    return [(0, SAMPLE_BYTES), (size - SAMPLE_BYTES, SAMPLE_BYTES)]
+
+
+class DuplicateFinder:
+    """Staged duplicate search with a shared hashing pool and digest cache."""
+
+    def __init__(self, workers=HASH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dup-hash")
+        self.scan_lock = threading.Lock()  # one scan at a time; a second one reuses its digests
+        self.lock = threading.Lock()
+        self.digests = OrderedDict()  # (path, size, mtime_ns, stage) -> hex digest
+
+    def digest(self, file, stage):
+        """Digest of a file's sample ('sample') or contents ('full'). Returns (digest or None, bytes read)."""
+        _, path, size, mtime_ns = file
+        key = (path, size, mtime_ns, stage)
+        with self.lock:
+            cached = self.digests.get(key)
+            if cached is not None:
+                self.digests.move_to_end(key)
+                return cached, 0
+        try:
+            value, read = file_digest(path, sample_spans(size) if stage == 'sample' else [(0, size)])
+        except OSError:
+            return None, 0  # Gone or unreadable since the listing
+        with self.lock:
+            self.digests[key] = value
+            while len(self.digests) > MAX_CACHED:
+                self.digests.popitem(last=False)
+        return value, read
+
+    def split(self, groups, stage, stats):
+        """Hash every file in groups, splitting each group by digest. Drops files left alone."""
+        files = [file for group in groups for file in group]
+        results = self.executor.map(lambda file: self.digest(file, stage), files)
+        buckets = defaultdict(list)
+        for file, (value, read) in zip(files, results):
+            stats['bytes_read'] += read
+            if value is not None:
+                buckets[(file[2], value)].append(file)
+        return {key: group for key, group in buckets.items() if len(group) > 1}
+
+    def find(self, root, media_ext, ignored_dirs, recursive=False):
+        """
+        Groups of identical files under root, largest waste first. Each group
+        lists the oldest copy first (the one to keep), then the extra copies.
+        """
+        started = time.monotonic()
+        with self.scan_lock:
+            files = list(media_files(root, media_ext, ignored_dirs, recursive))
+            stats = {"files": len(files), "bytes_total": sum(f[2] for f in files), "bytes_read": 0}
+
+            by_size = defaultdict(list)
+            for file in files:
+                if file[2] > 0:
+                    by_size[file[2]].append(file)
+            same_size = [group for group in by_size.values() if len(group) > 1]
+            stats["size_collisions"] = sum(len(group) for group in same_size)
+
+            sampled = self.split(same_size, 'sample', stats)
+            done = {key: group for key, group in sampled.items() if key[0] <= 2 * SAMPLE_BYTES}
+            pending = [group for key, group in sampled.items() if key[0] > 2 * SAMPLE_BYTES]
+            stats["fully_hashed"] = sum(len(group) for group in pending)
+            done.update(self.split(pending, 'full', stats))
+
+        groups = []
+        for (size, value), group in done.items():
+            group.sort(key=lambda file: (file[3], file[0]))
+            groups.append({
+                "size": size,
+                "hash": value,
+                "files": [file[0] for file in group],
+                "wasted_bytes": size * (len(group) - 1),
+            })
+        groups.sort(key=lambda g: (-g["wasted_bytes"], g["files"][0]))
+        stats["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+        return {"groups": groups, "stats": stats}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
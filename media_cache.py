@@ -0,0 +1,359 @@
+"""
+Generated media assets (video posters and hover previews) and the on-disk
+cache they live in.
+
+Assets are content-addressed: the cache key is derived from the source
+path, size and mtime, so a changed file simply gets a new entry and stale
+ones age out. The cache is bounded by total size and evicts the least
+recently used entries. Rendering runs in a process pool across all cores,
+using a local ffmpeg binary when there is one and a pure-Python fallback
+(cover art embedded in the MP4) otherwise. Previews need ffmpeg; they are
+built ahead of time by a second, lower-priority pool.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+# Where assets are kept (shared by every served folder; keys include the full path)
+if os.name == 'nt':
+    CACHE_DIR = Path(os.environ.get('LOCALAPPDATA', Path.home())) / 'video-organizer' / 'cache'
+else:
+    CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'video-organizer'
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+THUMB_WIDTH = 320
+PREVIEW_WIDTH = 240
+PREVIEW_SECONDS = 3
+PREVIEW_FPS = 12
+RENDER_TIMEOUT = 60  # seconds a request waits for an asset to be rendered
+
+FFMPEG = shutil.which('ffmpeg')
+
+
+# --- Renderers (run in worker processes) ---
+
+def render_poster(src, dst):
+    """Write a JPEG poster frame for src to dst. Returns True on success."""
+    if FFMPEG:
+        # Seek a second in to skip fade-ins; very short clips fall back to the first frame
+        for seek in ('1', '0'):
+            cmd = [FFMPEG, '-v', 'error', '-y', '-ss', seek, '-i', src, '-frames:v', '1',
+                   '-vf', f"scale={THUMB_WIDTH}:-2", '-q:v', '5', '-f', 'mjpeg', dst]
+            try:
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               timeout=RENDER_TIMEOUT, check=True)
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if os.path.getsize(dst) > 0:
+                return True
+        return False
+
+    cover = read_mp4_cover(src)
+    if cover is None:
+        return False
+    with open(dst, 'wb') as f:
+        f.write(cover)
+    return True
+
+
+def render_preview(src, dst):
+    """Write a short, silent, low-bitrate MP4 clip of src to dst (ffmpeg only)."""
+    if not FFMPEG:
+        return False
+    for seek in ('1', '0'):
+        cmd = [FFMPEG, '-v', 'error', '-y', '-ss', seek, '-i', src, '-t', str(PREVIEW_SECONDS), '-an',
+               '-vf', f"scale={PREVIEW_WIDTH}:-2,fps={PREVIEW_FPS}", '-c:v', 'libx264', '-preset', 'veryfast',
+               '-crf', '32', '-pix_fmt', 'yuv420p', '-movflags', '+faststart', '-f', 'mp4', dst]
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           timeout=RENDER_TIMEOUT, check=True)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if os.path.getsize(dst) > 0:
+            return True
+    return False
+
+
+def read_mp4_cover(src):
+    """Cover art from moov/udta/meta/ilst/covr, reading only box headers and the image."""
+    try:
+        with open(src, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            box = find_box(f, 0, size, [b'moov', b'udta', b'meta', b'ilst', b'covr', b'data'])
+            if box is None:
+                return None
+            start, end = box
+            f.seek(start + 8)  # data box: 4 bytes type, 4 bytes locale
+            return f.read(end - start - 8) or None
+    except OSError:
+        return None
+
+
+def find_box(f, start, end, path):
+    """Locate the payload (start, end) of a nested ISO-BMFF box path."""
+    name, rest = path[0], path[1:]
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack('>I4s', header)
+        offset = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            offset = 16
+        elif size == 0:
+            size = end - pos
+        if size < offset:
+            return None
+        if kind == name:
+            payload = pos + offset
+            if kind == b'meta':
+                payload += 4  # full box: version and flags
+            if not rest:
+                return payload, pos + size
+            return find_box(f, payload, pos + size, rest)
+        pos += size
+    return None
+
+
+# kind -> (renderer, file suffix, settings that go into the cache key)
+RENDERERS = {
+    'poster': (render_poster, '.jpg', f"{THUMB_WIDTH}"),
+    'preview': (render_preview, '.mp4', f"{PREVIEW_WIDTH}x{PREVIEW_SECONDS}s@{PREVIEW_FPS}"),
+}
+
+
+def available(kind):
+    """Whether assets of this kind can be rendered on this machine."""
+    return kind == 'poster' or FFMPEG is not None
+
+
+def lower_priority():
+    """Initializer for background workers, so they yield to on-demand renders."""
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+# --- Cache ---
+
+def cache_key(src, st, kind):
+    ident = f"{os.path.abspath(src)}|{st.st_size}|{st.st_mtime_ns}|{kind}|{RENDERERS[kind][2]}"
+    return hashlib.sha1(ident.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class AssetCache:
+    """Size-bounded LRU of files under root, named by key."""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or CACHE_DIR)
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        self.lock = threading.Lock()
+        self.entries = None  # key+suffix -> size, least recently used first
+        self.total = 0
+
+    def path_for(self, name):
+        return self.root / name[:2] / name
+
+    def load(self):
+        """Index what is already on disk, oldest first (mtime doubles as last use)."""
+        found = []
+        if self.root.exists():
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if '.tmp' in filename:
+                        continue
+                    try:
+                        st = os.stat(os.path.join(dirpath, filename))
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, filename, st.st_size))
+        found.sort()
+        self.entries = OrderedDict((name, size) for _, name, size in found)
+        self.total = sum(self.entries.values())
+
+    def lookup(self, name):
+        """Path of a cached asset, marked as recently used, or None."""
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        path = self.path_for(name)
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.forget(name)
+            return None
+        return path
+
+    def add(self, name):
+        path = self.path_for(name)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            self.forget(name)
+            self.entries[name] = size
+            self.total += size
+            self.evict()
+
+    def forget(self, name):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.total -= size
+
+    def evict(self):
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                self.path_for(name).unlink()
+            except OSError:
+                pass
+
+
+class RenderPending(Exception):
+    """The asset is still being rendered; ask again later."""
+
+
+class AssetPipeline:
+    """
+    Renders assets in process pools, deduplicating concurrent requests.
+    get() renders on demand; prefetch() queues work on a smaller background
+    pool, which a later get() for the same asset jumps ahead of.
+    """
+
+    def __init__(self, cache=None, workers=None):
+        self.cache = cache or AssetCache()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.background = None
+        # Reentrant: cancelling a queued Future runs finished() on this thread
+        self.lock = threading.RLock()
+        self.inflight = {}  # cache name -> Future
+        self.failed = set()  # cache names that could not be rendered
+
+    def pool(self):
+        if self.executor is None:
+            # spawn, not fork: forked workers would inherit the server's listening socket
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def background_pool(self):
+        if self.background is None:
+            self.background = ProcessPoolExecutor(max_workers=max(1, self.workers // 2),
+                                                  mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=lower_priority)
+        return self.background
+
+    def get(self, src, kind='poster', wait=True, timeout=RENDER_TIMEOUT):
+        """
+        Path of the cached asset for src, rendering it on a miss.
+        Returns None if it can't be rendered (or isn't ready and wait is False).
+        Raises RenderPending if the render takes longer than timeout seconds;
+        it goes on in the pool, so asking again later finds it.
+        """
+        name, path, future = self.schedule(src, kind, background=False)
+        if path is not None or future is None or not wait:
+            return path
+        try:
+            ok = future.result(timeout=timeout)
+        except FutureTimeout:
+            raise RenderPending(name) from None
+        except Exception:
+            return None
+        return self.cache.path_for(name) if ok else None
+
+    def prefetch(self, src, kind):
+        """Queue an asset for rendering in the background unless it is cached already."""
+        try:
+            self.schedule(src, kind, background=True)
+        except OSError:
+            pass
+
+    def schedule(self, src, kind, background):
+        """Returns (name, cached path or None, pending Future or None)."""
+        st = os.stat(src)
+        renderer, suffix, _ = RENDERERS[kind]
+        name = cache_key(src, st, kind) + suffix
+
+        path = self.cache.lookup(name)
+        if path is not None or name in self.failed or not available(kind):
+            return name, path, None
+
+        with self.lock:
+            future = self.inflight.get(name)
+            # Someone is waiting now: take queued background work off the slow pool
+            if future is not None and future.background and not background and future.cancel():
+                future = None
+            if future is None:
+                final = self.cache.path_for(name)
+                final.parent.mkdir(parents=True, exist_ok=True)
+                future = self.submit(background, renderer, src, str(final))
+                future.background = background
+                self.inflight[name] = future
+                future.add_done_callback(lambda fut, name=name: self.finished(name, fut))
+        return name, None, future
+
+    def submit(self, background, *args):
+        pool = self.background_pool if background else self.pool
+        try:
+            return pool().submit(render_to, *args)
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory): start over with a fresh pool
+            if background:
+                self.background = None
+            else:
+                self.executor = None
+            return pool().submit(render_to, *args)
+
+    def finished(self, name, future):
+        with self.lock:
+            if self.inflight.get(name) is future:
+                del self.inflight[name]
+        if future.cancelled():
+            return  # Resubmitted to the on-demand pool
+        try:
+            ok = future.result()
+        except Exception:
+            ok = False
+        if ok:
+            self.cache.add(name)
+        else:
+            self.failed.add(name)
+
+    def close(self):
+        for executor in (self.executor, self.background):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = self.background = None
+
+
+def render_to(renderer, src, dst):
+    """Render into a temp file and move it into place, so readers never see partial assets."""
+    tmp = f"{dst}.tmp{os.getpid()}"
+    try:
+        ok = renderer(src, tmp)
+        if ok:
+            os.replace(tmp, dst)
+        return ok
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
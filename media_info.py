@@ -0,0 +1,417 @@
+"""
+Duration, resolution, codec and frame rate of videos, read from their
+container headers only.
+
+MP4/MOV (ISO-BMFF): the top-level boxes are skipped by their headers until
+`moov`, which is read whole (it is small next to the media data, wherever
+in the file it is) and parsed in memory. WebM/MKV (Matroska): the EBML
+header and Segment children are read up to the Info and Tracks elements,
+which come before the first cluster. Either way a probe reads kilobytes,
+not the video.
+
+MediaInfoScanner keeps a DirectoryIndex's info current: videos are probed
+on a small thread pool as they appear or change, and the results are kept
+in the folder's scan catalog (scan_cache.py, shared with video_gallery.py),
+so after a restart only new or changed files are probed again.
+"""
+
+import os
+import sqlite3
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_cache import ScanCache
+
+INFO_FIELDS = ('duration', 'width', 'height', 'codec', 'fps')
+PROBE_EXT = {'.mp4', '.m4v', '.mov', '.webm', '.mkv'}
+PROBE_WORKERS = 4
+MAX_HEADER_BYTES = 32 * 1024 * 1024  # larger moov boxes or Matroska elements are not read
+SAVE_BATCH = 200  # probe results written to the catalog per transaction
+
+# Sample entry / CodecID -> codec name
+MP4_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264', b'hvc1': 'hevc', b'hev1': 'hevc', b'av01': 'av1',
+    b'vp08': 'vp8', b'vp09': 'vp9', b'mp4v': 'mpeg4', b'apcn': 'prores', b'apch': 'prores',
+}
+MATROSKA_CODECS = {
+    'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1', 'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc', 'V_MPEG4/ISO/ASP': 'mpeg4', 'V_THEORA': 'theora',
+}
+
+BOX_HEADER = struct.Struct('>I4s')
+MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid'}
+
+
+def probe(path):
+    """{field: value} for INFO_FIELDS (None where unknown), or None if path isn't a readable MP4/Matroska file."""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(12)
+            if head[:4] == b'\x1a\x45\xdf\xa3':
+                info = probe_matroska(f, size)
+            elif head[4:8] in MP4_TOP_LEVEL:
+                info = probe_mp4(f, size)
+            else:
+                return None
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+    if info is None:
+        return None
+    if info.get('duration') is not None:
+        info['duration'] = round(info['duration'], 3)
+    if info.get('fps') is not None:
+        info['fps'] = round(info['fps'], 3)
+    return {field: info.get(field) for field in INFO_FIELDS}
+
+
+# --- ISO-BMFF ---
+
+def probe_mp4(f, size):
+    pos = 0
+    while pos + 8 <= size:
+        f.seek(pos)
+        header = f.read(16)
+        box_size, kind = BOX_HEADER.unpack_from(header)
+        offset = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', header, 8)[0]
+            offset = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < offset:
+            return None
+        if kind == b'moov':
+            if box_size - offset > MAX_HEADER_BYTES:
+                return None
+            f.seek(pos + offset)
+            return parse_moov(f.read(box_size - offset))
+        pos += box_size
+    return None
+
+
+def boxes(data, start=0, end=None):
+    """(type, payload start, payload end) of the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = BOX_HEADER.unpack_from(data, pos)
+        offset = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            offset = 16
+        elif size == 0:
+            size = end - pos
+        if size < offset or pos + size > end:
+            return
+        yield kind, pos + offset, pos + size
+        pos += size
+
+
+def child(data, start, end, *path):
+    """Payload (start, end) of the first box at a nested path, or None."""
+    for kind, payload, box_end in boxes(data, start, end):
+        if kind == path[0]:
+            return (payload, box_end) if len(path) == 1 else child(data, payload, box_end, *path[1:])
+    return None
+
+
+def timescale_duration(data, start):
+    """(timescale, duration) from an mvhd or mdhd payload."""
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+
+def parse_moov(data):
+    info = {}
+    mvhd = child(data, 0, len(data), b'mvhd')
+    if mvhd is not None:
+        timescale, duration = timescale_duration(data, mvhd[0])
+        if timescale and duration and duration != 0xFFFFFFFF:
+            info['duration'] = duration / timescale
+
+    for kind, start, end in boxes(data):
+        if kind != b'trak':
+            continue
+        hdlr = child(data, start, end, b'mdia', b'hdlr')
+        if hdlr is None or data[hdlr[0] + 8:hdlr[0] + 12] != b'vide':
+            continue
+        for field, value in parse_video_track(data, start, end).items():
+            info.setdefault(field, value)  # The movie's duration over the track's
+        break
+    return info
+
+
+def parse_video_track(data, start, end):
+    info = {}
+    mdhd = child(data, start, end, b'mdia', b'mdhd')
+    timescale = duration = 0
+    if mdhd is not None:
+        timescale, duration = timescale_duration(data, mdhd[0])
+
+    stsd = child(data, start, end, b'mdia', b'minf', b'stbl', b'stsd')
+    if stsd is not None and stsd[1] - stsd[0] >= 8 + 36:
+        entry = stsd[0] + 8  # version/flags and entry count
+        fourcc = data[entry + 4:entry + 8]
+        info['codec'] = MP4_CODECS.get(fourcc, fourcc.decode('latin-1').strip() or None)
+        info['width'], info['height'] = struct.unpack_from('>HH', data, entry + 32)
+
+    tkhd = child(data, start, end, b'tkhd')
+    if tkhd is not None:
+        base = tkhd[0] + (52 if data[tkhd[0]] == 1 else 40)
+        a, b, _, c, d = struct.unpack_from('>iiiii', data, base)
+        width, height = (v >> 16 for v in struct.unpack_from('>II', data, base + 36))
+        if width and height:
+            info['width'], info['height'] = width, height
+        if a == 0 and d == 0 and b and c and info.get('width'):
+            # Rotated 90 or 270 degrees (phone video): shown the other way round
+            info['width'], info['height'] = info['height'], info['width']
+
+    stts = child(data, start, end, b'mdia', b'minf', b'stbl', b'stts')
+    if stts is not None and timescale:
+        count = struct.unpack_from('>I', data, stts[0] + 4)[0]
+        samples = ticks = 0
+        for i in range(min(count, (stts[1] - stts[0] - 8) // 8)):
+            n, delta = struct.unpack_from('>II', data, stts[0] + 8 + i * 8)
+            samples += n
+            ticks += n * delta
+        if ticks:
+            info['fps'] = samples * timescale / ticks
+    if timescale and duration:
+        info['duration'] = duration / timescale
+    return info
+
+
+# --- Matroska / WebM ---
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TRACKS = 0x1654AE6B
+CLUSTER = 0x1F43B675
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+DEFAULT_DURATION = 0x23E383
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+
+
+def vint(data, pos, marker):
+    """EBML variable-length integer at pos: (value, length, all ones). IDs keep their marker bit."""
+    first = data[pos]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML integer")
+    value = first if marker else first & (0xFF >> length)
+    for byte in data[pos + 1:pos + length]:
+        value = value << 8 | byte
+    return value, length, not marker and value == (1 << (7 * length)) - 1
+
+
+def element_header(data, pos):
+    """(id, body start, body size or None if unknown) of the element at pos."""
+    eid, id_len, _ = vint(data, pos, True)
+    size, size_len, unknown = vint(data, pos + id_len, False)
+    return eid, pos + id_len + size_len, None if unknown else size
+
+
+def elements(data, start, end):
+    """(id, body start, body end) of the elements in data[start:end]."""
+    pos = start
+    while pos < end:
+        eid, body, size = element_header(data, pos)
+        body_end = end if size is None else min(body + size, end)
+        yield eid, body, body_end
+        pos = body_end
+
+
+def uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+
+def probe_matroska(f, size):
+    f.seek(0)
+    head = f.read(64)
+    eid, body, length = element_header(head, 0)
+    if eid != EBML_HEADER or length is None:
+        return None
+    f.seek(body + length)
+    head = f.read(16)
+    eid, seg_body, seg_size = element_header(head, 0)
+    if eid != SEGMENT:
+        return None
+    seg_start = body + length + seg_body
+    seg_end = size if seg_size is None else min(size, seg_start + seg_size)
+
+    found = {}
+    pos = seg_start
+    while pos < seg_end and len(found) < 2:
+        f.seek(pos)
+        head = f.read(16)
+        if len(head) < 2:
+            break
+        eid, body, length = element_header(head, 0)
+        if length is None or eid == CLUSTER:
+            break  # Media data: Info and Tracks come before it
+        if eid in (INFO, TRACKS):
+            if length > MAX_HEADER_BYTES:
+                return None
+            f.seek(pos + body)
+            found[eid] = f.read(length)
+        pos += body + length
+
+    info = {}
+    if INFO in found:
+        data = found[INFO]
+        scale, duration = 1_000_000, None
+        for eid, start, end in elements(data, 0, len(data)):
+            if eid == TIMECODE_SCALE:
+                scale = uint(data, start, end)
+            elif eid == DURATION and end - start in (4, 8):
+                duration = struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+        if duration:
+            info['duration'] = duration * scale / 1e9
+    if TRACKS in found:
+        info.update(parse_matroska_tracks(found[TRACKS]))
+    return info if found else None
+
+
+def parse_matroska_tracks(data):
+    for eid, start, end in elements(data, 0, len(data)):
+        if eid != TRACK_ENTRY:
+            continue
+        track = {}
+        is_video = False
+        for tid, tstart, tend in elements(data, start, end):
+            if tid == TRACK_TYPE:
+                is_video = uint(data, tstart, tend) == 1
+            elif tid == CODEC_ID:
+                codec = data[tstart:tend].rstrip(b'\0').decode('ascii', 'replace')
+                track['codec'] = MATROSKA_CODECS.get(codec, codec)
+            elif tid == DEFAULT_DURATION:
+                frame_ns = uint(data, tstart, tend)
+                if frame_ns:
+                    track['fps'] = 1e9 / frame_ns
+            elif tid == VIDEO:
+                for vid, vstart, vend in elements(data, tstart, tend):
+                    if vid == PIXEL_WIDTH:
+                        track['width'] = uint(data, vstart, vend)
+                    elif vid == PIXEL_HEIGHT:
+                        track['height'] = uint(data, vstart, vend)
+        if is_video:
+            return track
+    return {}
+
+
+# --- Background probing for the server ---
+
+class MediaInfoScanner:
+    """Probes a DirectoryIndex's videos in the background and stores the results in its scan catalog."""
+
+    def __init__(self, index, workers=PROBE_WORKERS):
+        self.index = index
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-probe")
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.queued = set()
+        self.unsaved = []
+        try:
+            self.catalog = ScanCache(index.root, check_same_thread=False)
+        except (OSError, sqlite3.Error):
+            self.catalog = None  # Probe everything, remember nothing
+
+        with index.lock:
+            files = dict(index.files)
+            index.listeners.append(self.changed)
+        stored = {}
+        with self.save_lock:
+            try:
+                if self.catalog is not None:
+                    # Info of files deleted or moved while we weren't watching
+                    self.catalog.prune_media_info(files)
+                    stored = {row[0]: row for row in self.catalog.media_info()}
+            except sqlite3.Error:
+                pass
+        known = {}
+        for name, stamp in files.items():
+            row = stored.get(name)
+            if row is not None and (row[1], row[2]) == stamp:
+                known[name] = dict(zip(INFO_FIELDS, row[3:]))
+        index.set_info(known)
+        self.probe([name for name in files if name not in known])
+
+    def changed(self, names, removed):
+        """Index listener (its lock held): probe new and changed files, forget removed ones off this thread."""
+        self.probe(names)
+        if removed:
+            self.executor.submit(self.forget, removed)
+
+    def forget(self, names):
+        with self.index.lock:
+            gone = {name for name in names if name not in self.index.files}  # Not back already
+        if not gone:
+            return
+        with self.lock:
+            self.unsaved = [row for row in self.unsaved if row[0] not in gone]
+        with self.save_lock:
+            if self.catalog is None:
+                return
+            try:
+                self.catalog.forget_media_info(gone)
+            except sqlite3.Error:
+                pass  # Pruned next start instead
+
+    def probe(self, names):
+        """Queue files of the index (by name) for probing; anything but a video is skipped."""
+        with self.lock:
+            for name in names:
+                if name in self.queued or os.path.splitext(name)[1].lower() not in PROBE_EXT:
+                    continue
+                self.queued.add(name)
+                self.executor.submit(self.run, name)
+
+    def run(self, name):
+        with self.lock:
+            self.queued.discard(name)  # Changed from here on: it's queued again
+        with self.index.lock:
+            stamp = self.index.files.get(name)
+        if stamp is None:
+            return
+        info = probe(self.index.root / name) or dict.fromkeys(INFO_FIELDS)
+        with self.index.lock:
+            if self.index.files.get(name) != stamp:
+                return
+            self.index.set_info({name: info})
+        with self.lock:
+            self.unsaved.append((name, *stamp, *(info[field] for field in INFO_FIELDS)))
+            if len(self.unsaved) < SAVE_BATCH and self.queued:
+                return
+            rows, self.unsaved = self.unsaved, []
+        self.save(rows)
+
+    def save(self, rows):
+        with self.save_lock:
+            if self.catalog is None or not rows:
+                return
+            try:
+                self.catalog.save_media_info(rows)
+            except sqlite3.Error:
+                pass  # e.g. locked by the gallery generator; probed again next start
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            rows, self.unsaved = self.unsaved, []
+        self.save(rows)
+        if self.catalog is not None:
+            with self.save_lock:
+                self.catalog.close()
+                self.catalog = None
@@ -0,0 +1,151 @@
+"""
+Request metrics for the /metrics endpoint, in the Prometheus text format.
+
+Both serving backends report each finished request here with its route
+(a small fixed set of labels, never the raw path), status, duration and
+bytes sent; errors are counted by exception type, including those the
+socket servers would otherwise swallow. Recording a request takes one
+lock and a handful of dict updates, so it stays on in production.
+
+Requests on routes that aren't streamed and take longer than
+SLOW_REQUEST_SECONDS are counted, logged and kept (the last SLOW_SAMPLES of
+them, with their path) for /api/slow-requests.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+PREFIX = 'gallery'
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_SECONDS = 0.5
+SLOW_SAMPLES = 50
+# Media bodies last as long as the client keeps reading (or until it seeks away), so their time says nothing about us
+STREAMED_ROUTES = frozenset({'media', 'media_range'})
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is called with the registry lock held."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self, log=print):
+        self.lock = threading.Lock()
+        self.log = log
+        self.started = time.time()
+        self.latency = {}  # route -> Histogram
+        self.requests = {}  # (route, status) -> count
+        self.bytes_sent = {}  # route -> bytes
+        self.errors = {}  # exception type name -> count
+        self.slow = {}  # route -> count
+        self.slow_samples = deque(maxlen=SLOW_SAMPLES)
+        self.connections = 0
+
+    # --- Recording ---
+
+    def request_finished(self, route, method, path, status, seconds, sent):
+        slow = seconds >= SLOW_REQUEST_SECONDS and route not in STREAMED_ROUTES
+        with self.lock:
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            key = (route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_sent[route] = self.bytes_sent.get(route, 0) + sent
+            if slow:
+                self.slow[route] = self.slow.get(route, 0) + 1
+                self.slow_samples.append({
+                    "time": round(time.time(), 3),
+                    "route": route,
+                    "method": method,
+                    "path": path,
+                    "status": status,
+                    "seconds": round(seconds, 4),
+                    "bytes": sent,
+                })
+        if slow:
+            self.log(f"🐢 Slow request: {method} {path} -> {status} in {seconds * 1000:.0f} ms")
+
+    def error(self, exc_type):
+        name = exc_type.__name__ if isinstance(exc_type, type) else str(exc_type)
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections += 1
+
+    def connection_closed(self):
+        with self.lock:
+            self.connections -= 1
+
+    def slow_requests(self):
+        """The sampled slow requests, newest first."""
+        with self.lock:
+            return list(reversed(self.slow_samples))
+
+    # --- Exposition ---
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format (version 0.0.4)."""
+        threads = threading.active_count()
+        with self.lock:
+            latency = {route: (list(h.counts), h.sum) for route, h in self.latency.items()}
+            requests = dict(self.requests)
+            bytes_sent = dict(self.bytes_sent)
+            errors = dict(self.errors)
+            slow = dict(self.slow)
+            connections = self.connections
+
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        family('request_duration_seconds', 'histogram', "Time from request line to last byte sent, by route.")
+        for route in sorted(latency):
+            counts, total = latency[route]
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{PREFIX}_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_request_duration_seconds_sum{{route="{route}"}} {total:.6f}')
+            lines.append(f'{PREFIX}_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+
+        family('requests_total', 'counter', "Requests answered, by route and status code.")
+        for (route, status), count in sorted(requests.items()):
+            lines.append(f'{PREFIX}_requests_total{{route="{route}",code="{status}"}} {count}')
+
+        family('response_bytes_total', 'counter', "Bytes sent (headers and bodies, sendfile included), by route.")
+        for route, count in sorted(bytes_sent.items()):
+            lines.append(f'{PREFIX}_response_bytes_total{{route="{route}"}} {count}')
+
+        family('errors_total', 'counter', "Errors by exception type, including ones the server does not report.")
+        for name, count in sorted(errors.items()):
+            lines.append(f'{PREFIX}_errors_total{{type="{name}"}} {count}')
+
+        family('slow_requests_total', 'counter',
+               f"Requests slower than {SLOW_REQUEST_SECONDS} s (media streams excluded), by route.")
+        for route, count in sorted(slow.items()):
+            lines.append(f'{PREFIX}_slow_requests_total{{route="{route}"}} {count}')
+
+        family('active_connections', 'gauge', "Client connections open now.")
+        lines.append(f'{PREFIX}_active_connections {connections}')
+        family('threads', 'gauge', "Threads in the server process.")
+        lines.append(f'{PREFIX}_threads {threads}')
+        family('start_time_seconds', 'gauge', "When the server started, in Unix time.")
+        lines.append(f'{PREFIX}_start_time_seconds {self.started:.3f}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,155 @@
+"""
+Background queue for moves that can't be a rename.
+
+Within one volume a move is a rename and happens at once. Across volumes
+it is a full copy plus delete, which for a multi-gigabyte video blocks the
+request for minutes. Those moves become jobs instead: a few worker threads
+copy them in chunks into a temporary file next to the destination, then
+put it in place and remove the source. Progress (bytes copied, throughput)
+is recorded on the job for /api/jobs to report.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+MOVE_WORKERS = 2  # concurrent cross-volume copies; more just fight over the disks
+CHUNK_SIZE = 4 * 1024 * 1024
+FINISHED_LIMIT = 200  # finished jobs remembered for polling clients
+
+
+def same_volume(src, dst_dir):
+    """Whether src can be renamed into dst_dir (both must exist)."""
+    return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+
+
+class AlreadyMoving(Exception):
+    """submit() was given a source that another job is still moving."""
+
+
+class MoveJob:
+    """One queued cross-volume move and its progress."""
+
+    def __init__(self, src, dst, target, touched=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.src = str(src)
+        self.dst = str(dst)
+        self.target = target  # destination folder as the client named it
+        self.touched = tuple(touched)  # index paths to refresh when the job ends
+        self.state = 'queued'  # -> copying -> done | failed
+        self.error = None
+        self.total = 0
+        self.copied = 0
+        self.started = None
+        self.finished = None
+
+    def as_dict(self):
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0
+        return {
+            "id": self.id,
+            "filename": os.path.basename(self.src),
+            "target": self.target,
+            "state": self.state,
+            "error": self.error,
+            "bytes_total": self.total,
+            "bytes_copied": self.copied,
+            "bytes_per_second": int(self.copied / elapsed) if elapsed > 0 else 0,
+        }
+
+
+class MoveQueue:
+    """Runs MoveJobs on a bounded pool of worker threads."""
+
+    def __init__(self, workers=MOVE_WORKERS, on_finished=None):
+        self.on_finished = on_finished or (lambda job: None)
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.pending = deque()
+        self.jobs = OrderedDict()  # id -> job, oldest first
+        self.active = {}  # source path -> job, until it finishes
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.worker, name=f"move-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def busy(self, src):
+        with self.lock:
+            return str(src) in self.active
+
+    def submit(self, src, dst, target, touched=()):
+        """Queue a move. Raises AlreadyMoving if src is queued or copying already."""
+        job = MoveJob(src, dst, target, touched)
+        with self.lock:
+            if job.src in self.active:
+                raise AlreadyMoving(job.src)
+            self.jobs[job.id] = job
+            self.active[job.src] = job
+            self.pending.append(job)
+            self.ready.notify()
+        return job
+
+    def get(self, ids=None):
+        """Jobs by id, or all that are queued, running or recently finished."""
+        with self.lock:
+            if ids is None:
+                return list(self.jobs.values())
+            return [self.jobs[i] for i in ids if i in self.jobs]
+
+    def worker(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopped:
+                    self.ready.wait()
+                if self.stopped:
+                    return
+                job = self.pending.popleft()
+            self.run(job)
+
+    def run(self, job):
+        job.state = 'copying'
+        job.started = time.monotonic()
+        try:
+            self.copy(job)
+            job.state = 'done'
+        except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
+        job.finished = time.monotonic()
+
+        with self.lock:
+            self.active.pop(job.src, None)
+            finished = [j for j in self.jobs.values() if j.finished]
+            for old in finished[:max(0, len(finished) - FINISHED_LIMIT)]:
+                del self.jobs[old.id]
+        self.on_finished(job)
+
+    def copy(self, job):
+        """Copy in chunks (counting progress), put the copy in place, then drop the source."""
+        tmp = f"{job.dst}.part"
+        try:
+            with open(job.src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+                job.total = os.fstat(fsrc.fileno()).st_size
+                while True:
+                    if self.stopped:
+                        raise RuntimeError("Server shutting down")
+                    chunk = fsrc.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    fdst.write(chunk)
+                    job.copied += len(chunk)
+            shutil.copystat(job.src, tmp)
+            os.replace(tmp, job.dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        os.remove(job.src)
+
+    def close(self):
+        """Stop the workers; copies in progress are abandoned and their temp files removed."""
+        with self.lock:
+            self.stopped = True
+            self.ready.notify_all()
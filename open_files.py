@@ -0,0 +1,308 @@
+"""
+Open read-only media files shared between requests.
+
+A browser scrubbing through a video sends a Range request every few hundred
+milliseconds, each of which used to open the file, stat it and guess its
+type again. OpenFileCache keeps a bounded LRU of open files with their stat
+and content type, keyed by absolute path. A cached entry is checked with a
+single stat per request and dropped as soon as the file's identity, size or
+mtime no longer match, or when the API moves or deletes it (invalidate).
+
+Open handles lock files on Windows (they can't be renamed or deleted), so
+descriptors are never kept long: an entry nobody is reading from is closed
+after IDLE_SECONDS, and invalidate closes it at once, or when its last
+reader finishes.
+
+Readers share one descriptor, so body data must be read at explicit
+offsets. Each lease on a shared descriptor hands out a SharedFile: a file
+object with a position of its own whose reads are os.pread calls, so code
+that seeks and reads (the copy loop when sendfile can't be used, and the
+fallbacks inside socket.sendfile and loop.sendfile) never moves another
+request's offset. Where os.pread doesn't exist, a reader that finds the
+file busy gets a private descriptor for its request instead.
+
+ReadAhead warms files the organizer is about to show: it opens them
+through the cache and has the OS pull their first and last megabytes into
+the page cache, so the player's first requests don't wait on the disk.
+Without posix_fadvise (Windows, macOS) it reads them itself, on a file of
+its own that is closed right after.
+"""
+
+import mimetypes
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_OPEN_FILES = 64
+IDLE_SECONDS = 5  # close descriptors unused for this long (releases Windows file locks)
+SHARE_FILES = hasattr(os, 'pread')
+
+READ_AHEAD_WORKERS = 2
+WARM_HEAD_BYTES = 4 * 1024 * 1024  # container headers and the first seconds of video
+WARM_TAIL_BYTES = 1024 * 1024  # the MP4 index, when it was written at the end
+WARM_INTERVAL = 60  # seconds before the same file is warmed again
+
+
+def cache_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def guess_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+class OpenFile:
+    """One cached file: the open file object, its stat and its content type."""
+
+    def __init__(self, key, f, st, content_type):
+        self.key = key
+        self.file = f
+        self.stat = st
+        self.content_type = content_type
+        self.readers = 0
+        self.last_used = time.monotonic()
+        self.stale = False  # dropped from the cache; close when the last reader is done
+
+    def matches(self, st):
+        old = self.stat
+        return (st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns) == \
+               (old.st_ino, old.st_dev, old.st_size, old.st_mtime_ns)
+
+
+class SharedFile:
+    """
+    One reader's view of a descriptor other requests read too: seek() and
+    tell() move only this view's position, and reads use os.pread. Closing
+    it leaves the descriptor to the cache.
+    """
+    mode = 'rb'
+
+    def __init__(self, f):
+        self.fd = f.fileno()
+        self.pos = 0
+
+    def fileno(self):
+        return self.fd
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.pos
+        elif whence == os.SEEK_END:
+            offset += os.fstat(self.fd).st_size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.pos = offset
+        return offset
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = max(0, os.fstat(self.fd).st_size - self.pos)
+        data = os.pread(self.fd, size, self.pos)
+        self.pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class Lease:
+    """A request's use of a file. release() when the response is finished."""
+
+    def __init__(self, cache, entry, f):
+        self.cache = cache
+        self.entry = entry
+        self.private = f is not entry.file  # See SHARE_FILES
+        self.file = SharedFile(f) if SHARE_FILES and not self.private else f
+        self.stat = entry.stat
+        self.content_type = entry.content_type
+
+    def release(self):
+        if self.private:
+            self.file.close()
+        self.cache.release(self.entry)
+
+
+class OpenFileCache:
+    """LRU of OpenFiles by path, handing out Leases on them."""
+
+    def __init__(self, max_open=MAX_OPEN_FILES, idle_seconds=IDLE_SECONDS):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> OpenFile, least recently used first
+        self.stopped = threading.Event()
+        self.sweeper = threading.Thread(target=self.sweep, name="open-file-sweeper", daemon=True)
+        self.sweeper.start()
+
+    def acquire(self, path):
+        """Lease on the regular file at path. Raises OSError if it is missing or not a regular file."""
+        key = cache_key(path)
+        st = os.stat(key)
+        if not stat.S_ISREG(st.st_mode):
+            raise OSError(f"Not a regular file: {key}")
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not entry.matches(st):
+                self.drop(entry)  # Rewritten or replaced since it was opened
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                entry.readers += 1
+                entry.last_used = time.monotonic()
+                if SHARE_FILES or entry.readers == 1:
+                    return Lease(self, entry, entry.file)
+                private = True
+            else:
+                private = False
+
+        if private:
+            try:
+                return Lease(self, entry, open(key, 'rb'))
+            except OSError:
+                self.release(entry)
+                raise
+
+        f = open(key, 'rb')
+        try:
+            st = os.fstat(f.fileno())
+        except OSError:
+            f.close()
+            raise
+        entry = OpenFile(key, f, st, guess_type(key))
+        entry.readers = 1
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.drop(old, forget=False)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_open:
+                _, oldest = self.entries.popitem(last=False)
+                self.drop(oldest, forget=False)
+        return Lease(self, entry, f)
+
+    def release(self, entry):
+        with self.lock:
+            entry.readers -= 1
+            entry.last_used = time.monotonic()
+            if entry.stale and entry.readers == 0:
+                entry.file.close()
+
+    def invalidate(self, path):
+        """Forget path (about to be moved or deleted), closing its descriptor if it's idle."""
+        with self.lock:
+            entry = self.entries.get(cache_key(path))
+            if entry is not None:
+                self.drop(entry)
+
+    def drop(self, entry, forget=True):
+        """Remove an entry (lock held): closed now if idle, else by its last reader."""
+        if forget:
+            del self.entries[entry.key]
+        entry.stale = True
+        if entry.readers == 0:
+            entry.file.close()
+
+    def sweep(self):
+        while not self.stopped.wait(self.idle_seconds / 2):
+            cutoff = time.monotonic() - self.idle_seconds
+            with self.lock:
+                for entry in [e for e in self.entries.values() if e.readers == 0 and e.last_used < cutoff]:
+                    self.drop(entry)
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            for entry in list(self.entries.values()):
+                self.drop(entry)
+
+
+def warm(f, size):
+    """
+    Have the OS read the head and tail of an open file into the page cache.
+    Without posix_fadvise it is read, through f's own offset: give it a
+    private file (or a SharedFile), never a shared descriptor.
+    """
+    spans = [(0, min(size, WARM_HEAD_BYTES))]
+    if size > WARM_HEAD_BYTES:
+        tail = max(WARM_HEAD_BYTES, size - WARM_TAIL_BYTES)
+        spans.append((tail, size - tail))
+    fd = f.fileno()
+    for offset, length in spans:
+        if hasattr(os, 'posix_fadvise'):
+            # Starts the reads and returns; the kernel fills the cache in the background
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+            continue
+        f.seek(offset)
+        while length > 0:
+            data = f.read(min(length, 1024 * 1024))
+            if not data:
+                break
+            length -= len(data)
+
+
+class ReadAhead:
+    """
+    Warms files in the background on a small thread pool. Each hint
+    replaces the previous one's files that haven't started yet, so holding
+    down an arrow key doesn't queue up the whole library.
+    """
+
+    def __init__(self, cache, workers=READ_AHEAD_WORKERS):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="read-ahead")
+        self.lock = threading.Lock()
+        self.pending = []
+        self.recent = OrderedDict()  # key -> when it was last warmed
+
+    def hint(self, paths):
+        """Queue paths for warming, skipping recently warmed ones. Returns how many were queued."""
+        with self.lock:
+            for future in self.pending:
+                future.cancel()
+            now = time.monotonic()
+            fresh = [path for path in paths
+                     if now - self.recent.get(cache_key(path), -WARM_INTERVAL) >= WARM_INTERVAL]
+            self.pending = [self.executor.submit(self.warm, path) for path in fresh]
+        return len(fresh)
+
+    def warm(self, path):
+        with self.lock:
+            self.recent[cache_key(path)] = time.monotonic()
+            self.recent.move_to_end(cache_key(path))
+            while len(self.recent) > MAX_OPEN_FILES * 4:
+                self.recent.popitem(last=False)
+        if not hasattr(os, 'posix_fadvise'):
+            # Reading takes a while: do it on a file of our own, closed as soon as
+            # it's done, so no cached descriptor (a lock, on Windows) is left
+            # behind on a file the organizer may be about to move
+            try:
+                with open(path, 'rb') as f:
+                    warm(f, os.fstat(f.fileno()).st_size)
+            except OSError:
+                pass
+            return
+        try:
+            lease = self.cache.acquire(path)
+        except OSError:
+            return
+        try:
+            warm(lease.file, lease.stat.st_size)
+        except OSError:
+            pass
+        finally:
+            lease.release()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
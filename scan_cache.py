@@ -0,0 +1,176 @@
+"""
+Persistent catalog of a scanned video library (SQLite).
+
+Remembers every scanned folder with its mtime and sub-folders, and every
+video with its size and mtime. Media info probed from the videos' headers
+(media_info.py) is kept per file too, for the size and mtime it was read
+at, until the file goes; the server keeps the info of the folder it serves
+here as well. A folder's mtime changes whenever an entry is added, removed
+or renamed in it, so on the next run only folders whose mtime moved have to
+be listed again; the rest come from here. Files rewritten in place don't touch their folder's mtime, so
+those need a full rescan to be noticed.
+
+The catalog lives in the user's cache folder rather than the library, since
+writing it there would itself change the library root's mtime.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+if os.name == 'nt':
+    CACHE_DIR = Path(os.environ.get('LOCALAPPDATA', Path.home())) / 'video-organizer' / 'scans'
+else:
+    CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'video-organizer-scans'
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,          -- '' for the root, else 'a/b/'
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL           -- JSON list of names
+);
+CREATE TABLE IF NOT EXISTS videos (
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,             -- relative to the root, '/'-separated
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (folder, name)
+);
+CREATE INDEX IF NOT EXISTS videos_mtime ON videos (mtime);
+CREATE TABLE IF NOT EXISTS media_info (
+    name TEXT PRIMARY KEY,          -- relative to the root, '/'-separated
+    size INTEGER NOT NULL,          -- the file's size and mtime when it was probed
+    mtime REAL NOT NULL,
+    duration REAL,                  -- seconds; NULL where the headers didn't say
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    fps REAL
+);
+CREATE INDEX IF NOT EXISTS media_info_duration ON media_info (duration);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def cache_path(root):
+    """Catalog file for the library at root."""
+    key = hashlib.sha1(str(Path(root).resolve()).encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+    return CACHE_DIR / f"{key}.sqlite"
+
+
+class ScanCache:
+    """Folders and videos from the last scan of one library."""
+
+    def __init__(self, root, check_same_thread=True):
+        self.path = cache_path(root)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=check_same_thread)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS videos;"
+                                  "DROP TABLE IF EXISTS media_info; DROP TABLE IF EXISTS state;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def folders(self):
+        """{folder: (mtime_ns, subdirs)} as of the last scan."""
+        rows = self.db.execute("SELECT path, mtime_ns, subdirs FROM folders")
+        return {path: (mtime_ns, json.loads(subdirs)) for path, mtime_ns, subdirs in rows}
+
+    def update(self, changed, removed):
+        """
+        Store rescanned folders ({folder: (mtime_ns, records, subdirs)}, each
+        record starting with name, size, mtime) and forget removed ones.
+        """
+        with self.db:
+            for folder in removed:
+                self.db.execute("DELETE FROM folders WHERE path = ?", (folder,))
+                self.db.execute("DELETE FROM media_info WHERE name IN (SELECT name FROM videos WHERE folder = ?)",
+                                (folder,))
+                self.db.execute("DELETE FROM videos WHERE folder = ?", (folder,))
+
+            for folder, (mtime_ns, records, subdirs) in changed.items():
+                self.db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)",
+                                (folder, mtime_ns, json.dumps(subdirs)))
+                present = {name for name, *_ in records}
+                stale = [(folder, name) for (name,) in
+                         self.db.execute("SELECT name FROM videos WHERE folder = ?", (folder,))
+                         if name not in present]
+                self.db.executemany("DELETE FROM videos WHERE folder = ? AND name = ?", stale)
+                self.db.executemany("DELETE FROM media_info WHERE name = ?", [(name,) for _, name in stale])
+                self.db.executemany(
+                    "INSERT INTO videos (folder, name, size, mtime) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (folder, name) DO UPDATE SET size = excluded.size, mtime = excluded.mtime",
+                    [(folder, name, size, mtime) for name, size, mtime, *_ in records])
+
+    def set_folder_mtime(self, folder, mtime_ns, expected):
+        """
+        Record a folder's new mtime after a change of our own that added or
+        removed no videos, provided it was still at `expected` before.
+        """
+        with self.db:
+            self.db.execute("UPDATE folders SET mtime_ns = ? WHERE path = ? AND mtime_ns = ?",
+                            (mtime_ns, folder, expected))
+
+    def videos(self):
+        """
+        (name, size, mtime, duration, width, height, codec, fps) of every
+        video, newest first, read lazily. The media info is NULL for videos
+        not probed since they last changed.
+        """
+        return self.db.execute(
+            "SELECT v.name, v.size, v.mtime, m.duration, m.width, m.height, m.codec, m.fps FROM videos v "
+            "LEFT JOIN media_info m ON m.name = v.name AND m.size = v.size AND m.mtime = v.mtime "
+            "ORDER BY v.mtime DESC")
+
+    def unprobed(self):
+        """(name, size, mtime) of the videos with no media info for their current size and mtime."""
+        return self.db.execute(
+            "SELECT v.name, v.size, v.mtime FROM videos v LEFT JOIN media_info m "
+            "ON m.name = v.name AND m.size = v.size AND m.mtime = v.mtime WHERE m.name IS NULL").fetchall()
+
+    def media_info(self):
+        """(name, size, mtime, duration, width, height, codec, fps) of every probed file."""
+        return self.db.execute("SELECT name, size, mtime, duration, width, height, codec, fps FROM media_info")
+
+    def save_media_info(self, rows):
+        """Store probe results as (name, size, mtime, duration, width, height, codec, fps) rows."""
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO media_info VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def forget_media_info(self, names):
+        """Drop the media info of files that are gone."""
+        with self.db:
+            self.db.executemany("DELETE FROM media_info WHERE name = ?", [(name,) for name in names])
+
+    def prune_media_info(self, keep=()):
+        """
+        Drop the media info of files that are neither catalogued videos nor
+        named in keep (the files the server's index holds). Returns how many.
+        """
+        keep = set(keep)
+        orphans = [(name,) for (name,) in
+                   self.db.execute("SELECT name FROM media_info WHERE name NOT IN (SELECT name FROM videos)")
+                   if name not in keep]
+        with self.db:
+            self.db.executemany("DELETE FROM media_info WHERE name = ?", orphans)
+        return len(orphans)
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def get(self, key):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, value))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,183 @@
+"""
+Trigram index over the served folder's file names, for /api/search.
+
+Every name is normalised (lower case, `_`, `-` and `.` read as spaces, so
+"cat astronaut" finds cat_astronaut-v2.mp4) and split into its distinct
+three-character substrings. Each trigram maps to the ids of the names that
+contain it, kept in compact arrays.
+
+A substring query looks up its rarest trigrams, intersects them until few
+candidates are left and checks those against the names. When that finds
+little, fuzzy matching (typos, reordered words) adds names by how many of
+the query's trigrams they share, skipping trigrams so common they say
+nothing. Queries shorter than a trigram scan the names directly.
+
+The index follows a DirectoryIndex: names are added and removed as the
+index reports changes, whether from the watcher or from the API's moves
+and deletes. Removed names leave dead ids in the arrays until there are
+enough of them to be worth a rebuild.
+"""
+
+import threading
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+
+SEPARATORS = str.maketrans('_-.', '   ')
+FUZZY_BELOW = 50  # fuzzy matches are looked for when there are fewer substring matches than this
+FUZZY_MIN_SCORE = 0.5  # share of the query's trigrams a fuzzy match must have
+COMMON_TRIGRAM = 0.5  # trigrams in more than this share of names are ignored by fuzzy ranking
+NARROW_ENOUGH = 256  # stop intersecting trigram lists once this few candidates are left
+CACHED_QUERIES = 16  # ranked result lists kept for paging through them
+
+
+def normalize(text):
+    return text.lower().translate(SEPARATORS)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Names -> trigram postings, with ranked substring and fuzzy search."""
+
+    def __init__(self, names=()):
+        self.lock = threading.Lock()
+        self.names = {}  # id -> name
+        self.keys = {}  # id -> normalised name
+        self.ids = {}  # name -> id
+        self.postings = {}  # trigram -> array of ids, ascending, dead ones included
+        self.next_id = 0
+        self.dead = 0
+        self.version = 0  # bumped on every change; cached results are for one version
+        self.results = OrderedDict()  # (query, fuzzy, version) -> ranked [(name, match, score)]
+        with self.lock:
+            self.load(names)
+
+    # --- Updates ---
+
+    def update(self, added=(), removed=()):
+        """Apply names that appeared (or changed) and names that are gone."""
+        with self.lock:
+            for name in removed:
+                self.delete(name)
+            for name in added:
+                if name not in self.ids:
+                    self.insert(name)
+            if self.dead > max(1024, len(self.names)):
+                self.rebuild()
+
+    def insert(self, name):
+        key = normalize(name)
+        i = self.next_id
+        self.next_id += 1
+        self.names[i] = name
+        self.keys[i] = key
+        self.ids[name] = i
+        for gram in trigrams(key):
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('I')
+            postings.append(i)
+        self.version += 1
+
+    def delete(self, name):
+        i = self.ids.pop(name, None)
+        if i is None:
+            return
+        del self.names[i]
+        del self.keys[i]
+        self.dead += 1
+        self.version += 1
+
+    def load(self, names):
+        """Index names from scratch, in name order so that ids break ranking ties alphabetically (lock held)."""
+        names = sorted(names)
+        self.names = dict(enumerate(names))
+        self.keys = {i: normalize(name) for i, name in self.names.items()}
+        self.ids = {name: i for i, name in self.names.items()}
+        postings = defaultdict(list)
+        for i, key in self.keys.items():
+            for gram in trigrams(key):
+                postings[gram].append(i)
+        self.postings = {gram: array('I', ids) for gram, ids in postings.items()}
+        self.next_id = len(names)
+        self.dead = 0
+        self.version += 1
+
+    def rebuild(self):
+        """Drop dead ids from the postings (lock held)."""
+        self.load(self.names.values())
+
+    # --- Queries ---
+
+    def search(self, query, offset=0, limit=50, fuzzy=True):
+        """
+        One page of ranked matches for query: substring matches first (a match
+        at the start of the name, then at the start of a word, then shorter
+        names first), then, if those are few, fuzzy ones by score. Returns
+        (total, [(name, 'substring' | 'fuzzy', score)]).
+        """
+        key = normalize(query).strip()
+        if not key:
+            return 0, []
+        with self.lock:
+            cache_key = (key, fuzzy, self.version)
+            ranked = self.results.get(cache_key)
+            if ranked is None:
+                ranked = self.rank(key, fuzzy)
+                self.results[cache_key] = ranked
+                while len(self.results) > CACHED_QUERIES:
+                    self.results.popitem(last=False)
+            else:
+                self.results.move_to_end(cache_key)
+        return len(ranked), ranked[offset:offset + limit]
+
+    def rank(self, key, fuzzy):
+        # Ranking keys are packed into one int per match (tier, name length,
+        # id) so that tens of thousands of matches sort quickly; ids follow
+        # name order, apart from names added since the last rebuild.
+        hits = []
+        for i in self.substring_candidates(key):
+            text = self.keys[i]
+            at = text.find(key)
+            if at < 0:
+                continue
+            tier = 0 if at == 0 else 1 if text[at - 1] == ' ' else 2
+            hits.append((tier << 20 | min(len(text), 0xFFFFF)) << 32 | i)
+        hits.sort()
+        ranked = [(self.names[h & 0xFFFFFFFF], 'substring', 1.0) for h in hits]
+
+        if fuzzy and len(key) > 3 and len(hits) < FUZZY_BELOW:
+            found = {h & 0xFFFFFFFF for h in hits}
+            ranked += [(self.names[i], 'fuzzy', score) for i, score in self.fuzzy_matches(key, found)]
+        return ranked
+
+    def substring_candidates(self, key):
+        """Ids that may contain key: those having all of its rarest trigrams (every name for short keys)."""
+        grams = trigrams(key)
+        if not grams:
+            return list(self.names)
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        candidates = set(lists[0])
+        for postings in lists[1:]:
+            if len(candidates) <= NARROW_ENOUGH:
+                break
+            candidates.intersection_update(postings)
+        return [i for i in candidates if i in self.names]
+
+    def fuzzy_matches(self, key, exclude):
+        """(id, score) of names sharing enough of key's trigrams, best first."""
+        grams = trigrams(key)
+        common = max(COMMON_TRIGRAM * len(self.names), NARROW_ENOUGH)
+        counts = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is not None and len(postings) <= common:
+                counts.update(postings)
+        needed = FUZZY_MIN_SCORE * len(grams)
+        keys = self.keys
+        matches = [((len(grams) - shared) << 20 | min(len(keys[i]), 0xFFFFF)) << 32 | i
+                   for i, shared in counts.items() if shared >= needed and i in keys and i not in exclude]
+        matches.sort()
+        return [(m & 0xFFFFFFFF, round(1 - (m >> 52) / len(grams), 3)) for m in matches]
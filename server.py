@@ -3,11 +3,32 @@ import http.server
 import socketserver
 import os
 import json
+import mimetypes
 import urllib.parse
 import subprocess
 import hashlib
-import re
-from pathlib import Path
+import random
+import string
+import socket
+import select
+import time
+import threading
+import queue
+import argparse
+import signal
+import sys
+from email.utils import parsedate_to_datetime
+from pathlib import Path, PureWindowsPath
+
+import byte_ranges
+from dir_index import DirectoryIndex, SORT_KEYS, ORIENTATIONS
+from duplicates import DuplicateFinder
+from media_cache import RENDER_TIMEOUT, AssetPipeline, RenderPending
+from media_info import MediaInfoScanner
+from metrics import Metrics
+from move_jobs import AlreadyMoving, MoveQueue, same_volume
+from open_files import OpenFileCache, ReadAhead
+from search_index import SearchIndex
 
 # Config
 PORT = 8001
@@ -19,356 +40,1305 @@ VIDEO_EXT = {'.mp4', '.webm', '.avi', '.mov', '.mkv'}
 IMAGE_EXT = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
 MEDIA_EXT = VIDEO_EXT | IMAGE_EXT
 
+# Largest window /api/list returns in one response
+MAX_LIST_LIMIT = 5000
+MAX_SEARCH_LIMIT = 500  # matches per /api/search response
+MAX_BATCH_SIZE = 10000  # operations per /api/batch request
+MAX_PREFETCH = 8  # files per /api/prefetch hint
+
+# Folders never offered as move targets
+IGNORED_DIRS = {'trash', 'deleteVideos', '.git'}
+
+# HTTP/1.1 keep-alive: idle seconds before a connection is dropped, and the
+# number of requests one connection may serve before it is closed
+KEEPALIVE_TIMEOUT = 15
+MAX_KEEPALIVE_REQUESTS = 1000
+# Seconds a single read or write may block before the connection is dropped.
+# Longer than the idle limit: a paused player stops reading its open-ended
+# Range response until it needs more, often for minutes.
+SOCKET_TIMEOUT = 300
+
+# Worker-pool server: fixed number of connection threads, bounded accept queue.
+# When the queue is full, SATURATION_MODE 'wait' stops accepting (clients wait
+# in the kernel backlog) and '503' answers "Service Unavailable" right away.
+POOL_SIZE = 32
+QUEUE_DEPTH = 64
+SATURATION_MODE = 'wait'
+RETRY_AFTER = 1  # seconds, sent with 503 responses
+# Seconds a pool worker waits for a poster or preview to render before
+# answering 503; the render goes on, and the browser's retry finds it
+ASSET_WAIT = 2
+
+# Stream media bodies with os.sendfile (zero-copy) where the platform supports it
+USE_SENDFILE = hasattr(os, 'sendfile')
+
+# Cache-Control per kind of route (see cache_control); change with --cache-control kind=value.
+# 'no-cache' still lets browsers keep a copy, they just revalidate it (a cheap 304).
+CACHE_CONTROL = {
+    'app': 'no-cache',  # the organizer page, so an updated page shows at once
+    'page': 'no-cache',  # gallery.html and its manifest, rewritten by video_gallery.py
+    'asset': 'max-age=3600',  # generated posters and previews
+    'media': 'max-age=3600',  # the videos and images themselves
+}
+APP_ROUTES = ('/', '/video-organizer.html')
+METRICS_PATH = '/metrics'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PAGE_EXT = {'.html', '.ndjson'}
+mimetypes.add_type('application/x-ndjson', '.ndjson')
+
+# The organizer page as (body, etag, mtime), re-read when the file changes (see app_shell)
+APP_SHELL = None
+APP_SHELL_LOCK = threading.Lock()
+
+# Open media files shared by requests, with their stat and type (see get_open_files)
+OPEN_FILES = None
+READ_AHEAD = None
+
+# Directory index shared by all requests (see get_index)
+INDEX = None
+INDEX_LOCK = threading.Lock()
+
+# Probes the index's videos for duration, resolution and codec (see get_index)
+MEDIA_INFO = None
+
+# Trigram index of the index's file names for /api/search (see get_search)
+SEARCH = None
+
+# Thumbnail renderer and cache (see get_assets)
+ASSETS = None
+
+# Background copies for moves across volumes (see get_jobs)
+JOBS = None
+
+# Hashing pool and digest cache for /api/duplicates (see get_duplicates)
+DUPLICATES = None
+
+# Request latency, bytes, connections and error counts for /metrics, fed by both backends
+METRICS = Metrics()
+
+class ApiError(Exception):
+    """An API failure that maps onto an HTTP status code."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def check_filename(name):
+    # Allow / and \ for subdirectories (needed for undo), but ABSOLUTELY NO ..
+    if '..' in name:
+        raise ApiError(403, "Invalid filename (traversal detected)")
+
+def served_path(name, folder=False):
+    """
+    Path of name inside DIRECTORY. Raises ApiError(403) for '..' and for
+    absolute or drive-qualified names, which a Path join would otherwise take
+    as they are (even ones that point inside: names are relative to
+    DIRECTORY everywhere, the index included). With folder=True, DIRECTORY itself
+    ('.') is allowed too. (Symlinks inside the folder are followed, as they
+    are for the media themselves.)
+    """
+    check_filename(name)
+    if PureWindowsPath(name).anchor:  # '/x', '\\x', 'C:x', '//host/share', on any platform
+        raise ApiError(403, "Invalid filename (outside the served folder)")
+    root = Path(os.path.abspath(DIRECTORY))
+    path = Path(os.path.abspath(root / name))
+    if (path == root and not folder) or not path.is_relative_to(root):
+        raise ApiError(403, "Invalid filename (outside the served folder)")
+    return path
+
+def get_index():
+    """The directory index for DIRECTORY, built and watched on first use, with its media info scanner."""
+    global INDEX, MEDIA_INFO, SEARCH
+    root = Path(DIRECTORY).resolve()
+    with INDEX_LOCK:
+        if INDEX is None or INDEX.root != root:
+            if INDEX is not None:
+                INDEX.close()
+                MEDIA_INFO.close()
+            INDEX = DirectoryIndex(root, MEDIA_EXT, IGNORED_DIRS, assign_shortcuts)
+            MEDIA_INFO = MediaInfoScanner(INDEX)
+            SEARCH = None  # Rebuilt for the new folder on the next search
+            INDEX.watch()
+        return INDEX
+
+def list_media(data):
+    """
+    Media and folders in the served directory, answered from the index.
+
+    - {limit, offset, sort, order, type}: one window of the listing sorted
+      by name, mtime, size, duration, resolution or fps and filtered by
+      type ('video', 'image' or a list of extensions), with the total count
+      and the page's media info. Media info filters narrow it further:
+      orientation ('portrait', 'landscape', 'square'), min_duration and
+      max_duration (seconds) and codec (a name or a list).
+    - {since, epoch} from an earlier listing: only the changes since then
+      (or a full snapshot if those are unknown).
+    - {}: the full listing.
+    """
+    index = get_index()
+    if data.get('limit') is not None:
+        offset, limit = data.get('offset', 0), data.get('limit')
+        if not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or limit < 0:
+            raise ApiError(400, "offset and limit must be non-negative integers")
+
+        sort = data.get('sort', 'name')
+        if sort not in SORT_KEYS:
+            raise ApiError(400, f"Unknown sort key: {sort}")
+        order = data.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ApiError(400, f"Unknown order: {order}")
+
+        return index.window(offset, min(limit, MAX_LIST_LIMIT), sort, order == 'desc',
+                            media_types(data.get('type')), info_filters(data))
+
+    if data.get('since') is not None:
+        return index.changes_since(data.get('since'), data.get('epoch'))
+    return index.snapshot()
+
+def get_search():
+    """The filename search index, built from the directory index on first use and kept in step with it."""
+    global SEARCH
+    get_index()
+    with INDEX_LOCK:
+        if SEARCH is None:
+            started = time.monotonic()
+            with INDEX.lock:
+                search = SearchIndex(INDEX.files)
+                INDEX.listeners.append(lambda changed, removed: search.update(changed, removed))
+            SEARCH = search
+            print(f"🔎 Search index: {len(search.names)} names in {(time.monotonic() - started) * 1000:.0f} ms")
+        return SEARCH
+
+def search_media(data):
+    """
+    File names matching {query}: substring matches first (start of name,
+    then start of a word, then shorter names), then, when those are few,
+    fuzzy matches sharing most of the query's trigrams (unless {"fuzzy":
+    false}). Paged by {offset, limit}; returns the total, the page with
+    each match's kind and score, and the page's media info. An empty query
+    matches nothing but builds the index, so a client can warm it up.
+    """
+    query = data.get('query')
+    if not isinstance(query, str):
+        raise ApiError(400, "query must be a string")
+    offset, limit = data.get('offset', 0), data.get('limit', 50)
+    if not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or limit < 0:
+        raise ApiError(400, "offset and limit must be non-negative integers")
+    fuzzy = data.get('fuzzy', True)
+    if not isinstance(fuzzy, bool):
+        raise ApiError(400, "fuzzy must be true or false")
+
+    started = time.monotonic()
+    search = get_search()
+    total, page = search.search(query, offset, min(limit, MAX_SEARCH_LIMIT), fuzzy)
+    with INDEX.lock:
+        info = {name: INDEX.info[name] for name, _, _ in page if name in INDEX.info}
+    return {
+        "query": query,
+        "total": total,
+        "offset": offset,
+        "results": [{"name": name, "match": match, "score": score} for name, match, score in page],
+        "info": info,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 2),
+    }
+
+def media_types(kind):
+    """Extensions selected by a listing 'type' filter, or None for everything."""
+    if not kind or kind == 'all':
+        return None
+    if kind == 'video':
+        return frozenset(VIDEO_EXT)
+    if kind == 'image':
+        return frozenset(IMAGE_EXT)
+    if isinstance(kind, list) and all(isinstance(ext, str) for ext in kind):
+        return frozenset('.' + ext.lower().lstrip('.') for ext in kind)
+    raise ApiError(400, f"Unknown type filter: {kind}")
+
+def info_filters(data):
+    """The media info filters of a listing request, as a hashable tuple of (name, value)."""
+    filters = []
+    orientation = data.get('orientation')
+    if orientation is not None:
+        if orientation not in ORIENTATIONS:
+            raise ApiError(400, f"Unknown orientation: {orientation}")
+        filters.append(('orientation', orientation))
+    for key in ('min_duration', 'max_duration'):
+        value = data.get(key)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ApiError(400, f"{key} must be a non-negative number of seconds")
+            filters.append((key, float(value)))
+    codec = data.get('codec')
+    if codec is not None:
+        codecs = [codec] if isinstance(codec, str) else codec
+        if not isinstance(codecs, list) or not all(isinstance(c, str) for c in codecs):
+            raise ApiError(400, "codec must be a name or a list of names")
+        filters.append(('codec', frozenset(c.lower() for c in codecs)))
+    return tuple(filters)
+
+def assign_shortcuts(raw_dirs):
+    """Give each folder a keyboard shortcut. Returns name -> shortcut."""
+    used_shortcuts = set()
+    assignments = {} # name -> shortcut
+
+    # 1. Preferred: First Letter
+    unassigned = []
+    for name in raw_dirs:
+        first = name[0].upper()
+        if first.isalpha() and first not in used_shortcuts:
+            assignments[name] = first
+            used_shortcuts.add(first)
+        else:
+            unassigned.append(name)
+
+    # 2. Fallback: Random Available Letter for unassigned
+    available_letters = [c for c in string.ascii_uppercase if c not in used_shortcuts]
+
+    still_unassigned = []
+    for name in unassigned:
+        if available_letters:
+            # Pick random
+            param = random.choice(available_letters)
+            assignments[name] = param
+            used_shortcuts.add(param)
+            available_letters.remove(param)
+        else:
+            still_unassigned.append(name)
+
+    # 3. Fallback: Numbers 0-9 if all letters taken
+    available_numbers = [str(d) for d in range(10) if str(d) not in used_shortcuts]
+
+    for name in still_unassigned:
+        if available_numbers:
+            param = random.choice(available_numbers)
+            assignments[name] = param
+            used_shortcuts.add(param)
+            available_numbers.remove(param)
+        else:
+            # No shortcut available
+            assignments[name] = None
+
+    return assignments
+
+def update_index(*paths):
+    """Tell the index about entries the API just created, moved or removed."""
+    if INDEX is None:
+        return
+    for path in paths:
+        INDEX.refresh(str(path))
+
+def get_jobs():
+    global JOBS
+    with INDEX_LOCK:
+        if JOBS is None:
+            JOBS = MoveQueue(on_finished=job_finished)
+        return JOBS
+
+def job_finished(job):
+    forget_open_file(job.src)
+    update_index(*job.touched)
+    if job.state == 'done':
+        print(f"📂 Moved {job.touched[0]} to {job.target} (copied {job.total / 1e6:.1f} MB)")
+    else:
+        print(f"❌ Error moving {job.touched[0]}: {job.error}")
+
+def relocate(src, dst_dir, filename, target_dir):
+    """
+    Move src into dst_dir. On the same volume that's a rename, done now
+    (returns None); otherwise the copy is queued and its MoveJob returned.
+    """
+    jobs = get_jobs()
+    if jobs.busy(src):
+        raise ApiError(409, "File is already being moved")
+    dst = dst_dir / src.name
+    forget_open_file(src)
+    if same_volume(src, dst_dir):
+        shutil.move(str(src), str(dst))
+        return None
+    try:
+        job = jobs.submit(src, dst, target_dir, (filename, target_dir, Path(target_dir) / src.name))
+    except AlreadyMoving:
+        raise ApiError(409, "File is already being moved")  # A concurrent request queued it first
+    print(f"🚚 Copying {filename} to {target_dir} (other volume)")
+    return job
+
+def list_jobs(data):
+    """Progress of queued and recent moves: {"ids": [...]} or {} for all of them."""
+    ids = data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        raise ApiError(400, "ids must be a list")
+    jobs = JOBS.get(ids) if JOBS is not None else []
+    return {"jobs": [job.as_dict() for job in jobs]}
+
+def move_file(filename, target_dir):
+    """Move file to a subdirectory."""
+    if not filename or not target_dir:
+        raise ApiError(400, "Missing filename or target")
+
+    src = served_path(filename)
+    dst_dir = served_path(target_dir, folder=True)
+    # IMPORTANT: Use .name to ensure we don't accidentally nest paths if filename has a folder
+    dst = dst_dir / Path(filename).name
+
+    if not src.exists():
+        raise ApiError(404, "File not found")
+
+    try:
+        if not dst_dir.exists():
+            dst_dir.mkdir(exist_ok=True) # Should exist based on list, but safety
+
+        job = relocate(src, dst_dir, filename, target_dir)
+    except ApiError:
+        raise
+    except Exception as e:
+        print(f"❌ Error moving {filename}: {e}")
+        raise ApiError(500, str(e))
+    finally:
+        update_index(filename, target_dir, Path(target_dir) / Path(filename).name)
+
+    if job is not None:
+        return {"success": True, "job": job.as_dict()}
+    print(f"📂 Moved {filename} to {target_dir}")
+    return {"success": True}
+
+def delete_file(filename):
+    """Move file to trash."""
+    if not filename:
+        raise ApiError(400, "Missing filename")
+
+    src = served_path(filename)
+    trash_dir = served_path("trash", folder=True)
+
+    if not src.exists():
+        raise ApiError(404, "File not found")
+
+    try:
+        trash_dir.mkdir(exist_ok=True)
+        job = relocate(src, trash_dir, filename, "trash")
+    except ApiError:
+        raise
+    except Exception as e:
+        print(f"❌ Error moving {filename}: {e}")
+        raise ApiError(500, str(e))
+    finally:
+        update_index(filename)
+
+    if job is not None:
+        return {"success": True, "job": job.as_dict()}
+    print(f"🗑️ Moved to trash: {filename}")
+    return {"success": True}
+
+def plan_operation(op):
+    """
+    Validate one /api/batch item: {"op": "move", "filename", "target"} or
+    {"op": "delete", "filename"}. Returns (src, dst_dir); raises ApiError.
+    """
+    if not isinstance(op, dict):
+        raise ApiError(400, "Operation must be an object")
+    kind, filename = op.get('op'), op.get('filename')
+    if kind == 'move':
+        target_dir = op.get('target')
+        if not filename or not target_dir:
+            raise ApiError(400, "Missing filename or target")
+    elif kind == 'delete':
+        target_dir = 'trash'
+        if not filename:
+            raise ApiError(400, "Missing filename")
+    else:
+        raise ApiError(400, f"Unknown operation: {kind!r}")
+    if not isinstance(filename, str) or not isinstance(target_dir, str):
+        raise ApiError(400, "filename and target must be strings")
+
+    src = served_path(filename)
+    dst_dir = served_path(target_dir, folder=True)
+    if not src.exists():
+        raise ApiError(404, "File not found")
+    return src, dst_dir
+
+def batch_operations(data):
+    """
+    Run many moves and deletes in one request: {"operations": [...]}.
+    Every item is validated before anything moves and each target folder is
+    created once. Returns {"success", "results"}, one result per operation in
+    order; a failed item doesn't stop the others.
+    """
+    ops = data.get('operations')
+    if not isinstance(ops, list) or not ops:
+        raise ApiError(400, "operations must be a non-empty list")
+    if len(ops) > MAX_BATCH_SIZE:
+        raise ApiError(413, f"At most {MAX_BATCH_SIZE} operations per batch")
+
+    results, plans, seen = [], {}, set()
+    for i, op in enumerate(ops):
+        result = {"op": op.get('op'), "filename": op.get('filename')} if isinstance(op, dict) else {}
+        results.append(result)
+        try:
+            src, dst_dir = plan_operation(op)
+            if src in seen:
+                raise ApiError(409, "File appears more than once in the batch")
+        except ApiError as e:
+            result.update(success=False, status=e.status, error=str(e))
+            continue
+        seen.add(src)
+        plans[i] = (src, dst_dir)
+
+    for dst_dir in {dst_dir for _, dst_dir in plans.values()}:
+        try:
+            dst_dir.mkdir(exist_ok=True)
+        except OSError as e:
+            for i, (_, planned) in list(plans.items()):
+                if planned == dst_dir:
+                    results[i].update(success=False, status=500, error=str(e))
+                    del plans[i]
+
+    touched = {}  # Paths to refresh in the index, in order, without repeats
+    for i, (src, dst_dir) in plans.items():
+        result = results[i]
+        target_dir = ops[i].get('target', 'trash')
+        try:
+            job = relocate(src, dst_dir, result['filename'], target_dir)
+            result.update(success=True, target=target_dir)
+            if job is not None:
+                result['job'] = job.as_dict()
+        except ApiError as e:
+            result.update(success=False, status=e.status, error=str(e))
+        except Exception as e:
+            print(f"❌ Error moving {result['filename']}: {e}")
+            result.update(success=False, status=500, error=str(e))
+        touched.update(dict.fromkeys([result['filename'], target_dir, Path(target_dir) / src.name]))
+    update_index(*touched)
+
+    moved = sum(1 for r, op in zip(results, ops) if r.get('success') and op.get('op') == 'move')
+    trashed = sum(1 for r, op in zip(results, ops) if r.get('success') and op.get('op') == 'delete')
+    failed = len(results) - moved - trashed
+    queued = sum(1 for r in results if 'job' in r)
+    print(f"📦 Batch: {moved} moved, {trashed} moved to trash, {failed} failed"
+          + (f" ({queued} copying in the background)" if queued else ""))
+    return {"success": failed == 0, "results": results}
+
+def get_assets():
+    global ASSETS
+    with INDEX_LOCK:
+        if ASSETS is None:
+            ASSETS = AssetPipeline()
+        return ASSETS
+
+def get_open_files():
+    global OPEN_FILES
+    with INDEX_LOCK:
+        if OPEN_FILES is None:
+            OPEN_FILES = OpenFileCache()
+        return OPEN_FILES
+
+def get_read_ahead():
+    global READ_AHEAD
+    open_files = get_open_files()
+    with INDEX_LOCK:
+        if READ_AHEAD is None:
+            READ_AHEAD = ReadAhead(open_files)
+        return READ_AHEAD
+
+def prefetch_files(data):
+    """
+    Hint that the client is about to show {"files": [...]}: their first and
+    last megabytes are read into the page cache in the background.
+    """
+    files = data.get('files')
+    if not isinstance(files, list):
+        raise ApiError(400, "Missing files")
+    paths = []
+    for filename in files[:MAX_PREFETCH]:
+        if not isinstance(filename, str):
+            raise ApiError(400, "Invalid filename")
+        path = served_path(filename)
+        if path.suffix.lower() in MEDIA_EXT:
+            paths.append(path)
+    return {"queued": get_read_ahead().hint(paths)}
+
+def get_duplicates():
+    global DUPLICATES
+    with INDEX_LOCK:
+        if DUPLICATES is None:
+            DUPLICATES = DuplicateFinder()
+        return DUPLICATES
+
+def find_duplicates(data):
+    """
+    Groups of byte-identical media files: {} for the served folder,
+    {"recursive": true} to include its sub-folders. Each group's first file
+    is the oldest copy; the rest are the extras to trash.
+    """
+    recursive = data.get('recursive', False)
+    if not isinstance(recursive, bool):
+        raise ApiError(400, "recursive must be true or false")
+    result = get_duplicates().find(Path(DIRECTORY).resolve(), MEDIA_EXT, IGNORED_DIRS, recursive)
+    stats = result['stats']
+    copies = sum(len(g['files']) - 1 for g in result['groups'])
+    print(f"🔍 Duplicates: {copies} extra copies in {len(result['groups'])} groups among {stats['files']} files "
+          f"(read {stats['bytes_read'] / 1e6:.1f} of {stats['bytes_total'] / 1e6:.1f} MB in {stats['elapsed_ms']} ms)")
+    return result
+
+def slow_requests(data):
+    """The most recent requests that took longer than metrics.SLOW_REQUEST_SECONDS, newest first."""
+    return {"requests": METRICS.slow_requests()}
+
+def route_label(method, path, ranged):
+    """
+    The /metrics label for a request: the API route's name ('list', 'move',
+    ...), 'html', 'metrics', 'asset', 'media' or 'media_range'. Labels
+    never carry file names, so their number stays small.
+    """
+    if method == 'POST':
+        return path.removeprefix('/api/') if path in API_ROUTES else 'api_unknown'
+    if method not in ('GET', 'HEAD'):
+        return 'other'
+    if path in APP_ROUTES:
+        return 'html'
+    if path == METRICS_PATH:
+        return 'metrics'
+    if asset_route(path):
+        return 'asset'
+    return 'media_range' if ranged else 'media'
+
+def forget_open_file(path):
+    """Close a cached descriptor for path before it moves (Windows won't move open files)."""
+    if OPEN_FILES is not None:
+        OPEN_FILES.invalidate(path)
+
+def close_services():
+    """Stop the background services: watcher, media prober, move workers, renderers, hashing pool, open files."""
+    if INDEX is not None:
+        INDEX.close()
+    if MEDIA_INFO is not None:
+        MEDIA_INFO.close()
+    if JOBS is not None:
+        JOBS.close()
+    if ASSETS is not None:
+        ASSETS.close()
+    if DUPLICATES is not None:
+        DUPLICATES.close()
+    if READ_AHEAD is not None:
+        READ_AHEAD.close()
+    if OPEN_FILES is not None:
+        OPEN_FILES.close()
+
+# URL prefix -> (asset kind, URL suffix, content type) for generated assets
+ASSET_ROUTES = {
+    '/thumbnails/': ('poster', '.jpg', 'image/jpeg'),
+    '/previews/': ('preview', '.mp4', 'video/mp4'),
+}
+
+def asset_route(url_path):
+    """The ASSET_ROUTES prefix url_path falls under, or None."""
+    for prefix in ASSET_ROUTES:
+        if url_path.startswith(prefix):
+            return prefix
+    return None
+
+def asset_file(url_path, timeout=RENDER_TIMEOUT):
+    """
+    Cached asset for /thumbnails/<name>.jpg or /previews/<name>.mp4,
+    rendered on a miss. Returns (path, content type). Raises RenderPending
+    if the render takes longer than timeout seconds.
+    """
+    prefix = asset_route(url_path)
+    kind, suffix, content_type = ASSET_ROUTES[prefix]
+    name = urllib.parse.unquote(url_path.split('?', 1)[0][len(prefix):])
+    if name.endswith(suffix):
+        name = name[:-len(suffix)]
+    src = served_path(name)
+    if src.suffix.lower() not in VIDEO_EXT or not src.is_file():
+        raise ApiError(404, "File not found")
+
+    assets = get_assets()
+    path = assets.get(str(src), kind, timeout=timeout)
+    if kind == 'poster':
+        # A visible poster means a likely hover soon: have its preview ready by then
+        assets.prefetch(str(src), 'preview')
+    if path is None:
+        raise ApiError(404, f"No {kind} available")
+    return path, content_type
+
+def file_etag(st):
+    """Strong validator for a static file: changes whenever it is rewritten."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def asset_etag(path, st):
+    """
+    Validator for a generated asset. Their files are named by a key of the
+    source video and render settings, so the name identifies the content
+    (their mtime only tracks last use).
+    """
+    return f'"{Path(path).stem}-{st.st_size:x}"'
+
+def client_copy_current(if_none_match, if_modified_since, etag, mtime):
+    """
+    Whether a conditional GET can be answered 304: If-None-Match lists etag
+    or, when there is none, If-Modified-Since is no older than mtime.
+    """
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since or mtime is None:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def cache_control(url_path):
+    """Cache-Control value for a GET of url_path, or None to send none."""
+    path = url_path.split('?', 1)[0]
+    if path in APP_ROUTES:
+        kind = 'app'
+    elif asset_route(path):
+        kind = 'asset'
+    elif os.path.splitext(path)[1].lower() in PAGE_EXT:
+        kind = 'page'
+    else:
+        kind = 'media'
+    return CACHE_CONTROL.get(kind) or None
+
+def if_range_matches(header, etag, mtime):
+    """
+    Whether a Range may be honoured given the request's If-Range header: the
+    validator in it (an ETag or a Last-Modified date) must still match the
+    file exactly. Otherwise the whole, current file is sent.
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        return header == etag  # strong comparison: weak tags never match
+    try:
+        return parsedate_to_datetime(header).timestamp() == int(mtime)
+    except (TypeError, ValueError):
+        return False
+
+def app_shell():
+    """
+    The organizer page as (body, etag, mtime). Kept in memory and re-read
+    only when its size or mtime changes, so serving it is a stat call.
+    """
+    global APP_SHELL
+    html_path = SCRIPT_DIR / "video-organizer.html"
+    st = os.stat(html_path)
+    etag = file_etag(st)
+    with APP_SHELL_LOCK:
+        if APP_SHELL is None or APP_SHELL[1] != etag:
+            APP_SHELL = (html_path.read_bytes(), etag, st.st_mtime)
+        return APP_SHELL
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match header lists etag (weak comparison)."""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+# POST /api/... -> handler(json_body) -> JSON-serialisable result.
+# Shared by every serving backend.
+API_ROUTES = {
+    '/api/list': list_media,
+    '/api/move': lambda data: move_file(data.get('filename'), data.get('target')),
+    '/api/delete': lambda data: delete_file(data.get('filename')),
+    '/api/batch': batch_operations,
+    '/api/jobs': list_jobs,
+    '/api/prefetch': prefetch_files,
+    '/api/duplicates': find_duplicates,
+    '/api/search': search_media,
+    '/api/slow-requests': slow_requests,
+}
+
 class RangeHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """
     Adds support for HTTP 'Range' requests to SimpleHTTPRequestHandler.
-    Allows seeking in video files.
+    Allows seeking in video files (see byte_ranges for the forms accepted).
     """
+    bytes_sent = 0  # Sent by sendfile (and, with a CountingWriter, through wfile) for the current request
+
     def send_head(self):
         if 'Range' not in self.headers:
-            self.range = None
             return super().send_head()
-        
-        try:
-            self.range = re.search(r'bytes=(\d+)-(\d*)', self.headers['Range'])
-        except ValueError:
-            self.range = None
-            return super().send_head()
-            
-        if not self.range:
-            return super().send_head()
-            
+
         path = self.translate_path(self.path)
-        f = None
+        if os.path.isdir(path):
+            return super().send_head()
         try:
             f = open(path, 'rb')
         except OSError:
             self.send_error(404, "File not found")
             return None
 
-        # Get file size
         try:
             fs = os.fstat(f.fileno())
-            file_len = fs[6]
-        except:
+            spans = byte_ranges.parse(self.headers['Range'], fs.st_size)
+        except byte_ranges.RangeNotSatisfiable:
             f.close()
+            self.send_range_not_satisfiable(fs.st_size)
             return None
-
-        # Parse range
-        start, end = self.range.groups()
-        start = int(start)
-        if end:
-            end = int(end)
-        else:
-            end = file_len - 1
-            
-        # Validate
-        if start >= file_len:
-            self.send_error(416, "Requested Range Not Satisfiable")
-            self.send_header("Content-Range", f"bytes */{file_len}")
-            self.end_headers()
+        except OSError:
             f.close()
+            self.send_error(404, "File not found")
             return None
+        if spans is None:
+            # A Range to ignore (another unit, malformed, too many parts): send it all
+            f.close()
+            return super().send_head()
+        try:
+            return self.send_ranges(f, fs, spans, self.guess_type(path))
+        except BaseException:
+            f.close()
+            raise
 
+    def send_ranges(self, f, fs, spans, content_type, release=None):
+        """Send 206 headers for spans of f. Returns the body, for copyfile."""
         self.send_response(206)
-        self.send_header("Content-type", self.guess_type(path))
-        self.send_header("Content-Range", f"bytes {start}-{end}/{file_len}")
-        self.send_header("Content-Length", str(end - start + 1))
+        if len(spans) == 1:
+            start, end = spans[0]
+            self.send_header("Content-type", content_type)
+            self.send_header("Content-Range", byte_ranges.content_range(start, end, fs.st_size))
+            self.send_header("Content-Length", str(end - start + 1))
+            segments = [(start, end - start + 1)]
+        else:
+            multipart = byte_ranges.Multipart(spans, fs.st_size, content_type)
+            self.send_header("Content-type", multipart.content_type)
+            self.send_header("Content-Length", str(multipart.length))
+            segments = list(multipart.segments())
         self.send_header("Last-Modified", self.date_time_string(fs.st_mtime))
         self.end_headers()
-        
-        # Position file
-        f.seek(start)
-        return f
+        return FileSpans(f, segments, release)
+
+    def send_range_not_satisfiable(self, file_len):
+        self.send_response(416, "Requested Range Not Satisfiable")
+        self.send_header("Content-Range", f"bytes */{file_len}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
 
     def copyfile(self, source, outputfile):
         """
-        Custom copyfile that respects self.range limits if present.
+        Stream the response body, zero-copy via sendfile when possible.
+        Falls back to the regular copy loop when the socket can't do it.
         """
-        if not hasattr(self, 'range') or not self.range:
-            return super().copyfile(source, outputfile)
-            
-        # If range is present, we need to limit the read.
-        # But SimpleHTTPRequestHandler.copyfile does: shutil.copyfileobj(source, outputfile)
-        # We can't control it easily unless source is a wrapper.
-        # So we rely on send_head returning a LimitedFileWrapper.
+        if isinstance(source, FileSpans):
+            for segment in source.segments:
+                if isinstance(segment, bytes):
+                    outputfile.write(segment)  # Multipart boundary and part headers
+                else:
+                    self.copy_span(source.f, *segment, outputfile)
+            return
+        if self.sendfile(source):
+            return
         super().copyfile(source, outputfile)
 
-class LimitedFileWrapper:
-    def __init__(self, f, length):
+    def copy_span(self, f, offset, count, outputfile):
+        if self.sendfile(f, offset, count):
+            return
+        # A shared descriptor comes as an open_files.SharedFile, whose seek and read don't touch other requests
+        f.seek(offset)
+        while count > 0:
+            data = f.read(min(shutil.COPY_BUFSIZE, count))
+            if not data:
+                break
+            outputfile.write(data)
+            count -= len(data)
+
+    def sendfile(self, f, offset=None, count=None):
+        """
+        Send count bytes of f from offset (default: the rest of the file from
+        its position) straight from the page cache. Returns False if it can't.
+        """
+        if not USE_SENDFILE or not isinstance(self.connection, socket.socket):
+            return False
+
+        try:
+            if offset is None:
+                offset = f.tell()
+            if count is None:
+                count = os.fstat(f.fileno()).st_size - offset
+        except (AttributeError, OSError, ValueError):
+            return False
+
+        if count <= 0:
+            return True
+        self.bytes_sent += self.connection.sendfile(f, offset, count)
+        return True
+
+class CountingWriter:
+    """Wraps a handler's wfile, adding the bytes written through it to handler.bytes_sent."""
+    def __init__(self, raw, handler):
+        self.raw = raw
+        self.handler = handler
+
+    def write(self, data):
+        written = self.raw.write(data)
+        self.handler.bytes_sent += len(data)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+class FileSpans:
+    """
+    A response body: (offset, count) spans of f to send in order, with the
+    bytes of multipart boundaries in between. close() calls release (by
+    default, closes f).
+    """
+    def __init__(self, f, segments, release=None):
         self.f = f
-        self.length = length
-        self.read_so_far = 0
-        
-    def read(self, size=-1):
-        if self.read_so_far >= self.length:
-            return b""
-            
-        if size < 0:
-            remaining = self.length - self.read_so_far
-            data = self.f.read(remaining)
-            self.read_so_far += len(data)
-            return data
-            
-        remaining = self.length - self.read_so_far
-        to_read = min(size, remaining)
-        data = self.f.read(to_read)
-        self.read_so_far += len(data)
-        return data
+        self.segments = segments
+        self.release = release or f.close
 
     def close(self):
-        self.f.close()
+        self.release()
 
 class GalleryRequestHandler(RangeHTTPRequestHandler):
-    def do_POST(self):
-        """Handle JSON API requests."""
-        if self.path == '/api/list':
-            self.handle_list()
-        elif self.path == '/api/move':
-            self.handle_move()
-        elif self.path == '/api/delete':
-            self.handle_delete()
-        else:
-            self.send_error(404, "API endpoint not found")
+    # Persistent connections: a browser scrubbing a video reuses one socket
+    # (and one server thread) for all of its Range requests.
+    protocol_version = "HTTP/1.1"
+    # Covers every socket read and write, sendfile included; the idle limit
+    # between requests is enforced by wait_for_request instead
+    timeout = SOCKET_TIMEOUT
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # kept-alive response stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
 
-    def handle_list(self):
-        """Scan directory for media and folders."""
-        try:
-            root = Path(DIRECTORY)
-            
-            # Scan files
-            files = []
-            for item in root.iterdir():
-                if item.is_file() and item.suffix.lower() in MEDIA_EXT:
-                    if item.name.startswith('.'): continue
-                    files.append(item.name)
-            
-            files.sort()
-
-            # Scan directories
-            dirs = []
-            raw_dirs = []
-            
-            for item in root.iterdir():
-                if item.is_dir():
-                    name = item.name
-                    if name.startswith('.') or name in {'trash', 'deleteVideos', '.git'}:
-                        continue
-                    raw_dirs.append(name)
-            
-            # Sort directories by name
-            raw_dirs.sort()
-
-            # Assign shortcuts
-            import random
-            import string
-            
-            used_shortcuts = set()
-            assignments = {} # name -> shortcut
-            
-            # 1. Preferred: First Letter
-            unassigned = []
-            for name in raw_dirs:
-                first = name[0].upper()
-                if first.isalpha() and first not in used_shortcuts:
-                    assignments[name] = first
-                    used_shortcuts.add(first)
-                else:
-                    unassigned.append(name)
-            
-            # 2. Fallback: Random Available Letter for unassigned
-            available_letters = [c for c in string.ascii_uppercase if c not in used_shortcuts]
-            
-            still_unassigned = []
-            for name in unassigned:
-                if available_letters:
-                    # Pick random
-                    param = random.choice(available_letters)
-                    assignments[name] = param
-                    used_shortcuts.add(param)
-                    available_letters.remove(param)
-                else:
-                    still_unassigned.append(name)
-
-            # 3. Fallback: Numbers 0-9 if all letters taken
-            available_numbers = [str(d) for d in range(10) if str(d) not in used_shortcuts]
-            
-            for name in still_unassigned:
-                if available_numbers:
-                    param = random.choice(available_numbers)
-                    assignments[name] = param
-                    used_shortcuts.add(param)
-                    available_numbers.remove(param)
-                else:
-                    # No shortcut available
-                    assignments[name] = None
-
-            # Build result list
-            for name in raw_dirs:
-                dirs.append({
-                    "name": name,
-                    "shortcut": assignments.get(name)
-                })
-
-            self.send_json({
-                "files": files, 
-                "dirs": dirs,
-                "cwd": str(Path(DIRECTORY).resolve())
-            })
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile, self)
 
-        except Exception as e:
-            self.send_error(500, str(e))
+    def handle(self):
+        """Serve requests until the client closes, goes idle or hits the cap."""
+        self.requests_served = 0
+        self.close_connection = True
+        METRICS.connection_opened()
+        try:
+            if self.wait_for_request(first=True):
+                self.handle_one_request()
+            while not self.close_connection and self.wait_for_request():
+                self.handle_one_request()
+        finally:
+            METRICS.connection_closed()
 
-    def handle_move(self):
-        """Move file to a subdirectory."""
-        data = self.read_json()
-        if not data: return
+    def handle_one_request(self):
+        """Serve one request and record its route, status, time and bytes in METRICS."""
+        self.status = None
+        self.bytes_sent = 0
+        self.started = None
+        self.path = ''
+        try:
+            super().handle_one_request()
+        finally:
+            if self.status is not None:
+                now = time.perf_counter()
+                headers = getattr(self, 'headers', None)
+                route = route_label(self.command, self.path, headers is not None and 'Range' in headers)
+                METRICS.request_finished(route, self.command, self.path, self.status,
+                                         now - (self.started or now), self.bytes_sent)
 
-        filename = data.get('filename')
-        target_dir = data.get('target')
+    def parse_request(self):
+        self.started = time.perf_counter()  # Timed from the request line, not from the idle wait before it
+        return super().parse_request()
 
-        if not filename or not target_dir:
-            self.send_error(400, "Missing filename or target")
-            return
-
-        if not self.validate_filename(filename) or not self.validate_filename(target_dir):
-            return
+    def wait_for_request(self, first=False):
+        """
+        Wait up to KEEPALIVE_TIMEOUT for the next request on the connection.
+        An idle kept-alive connection gives its worker back as soon as other
+        connections are queued for the pool; a new one always gets its
+        first request served.
+        """
+        if not first and self.request_buffered():
+            return True
+        deadline = time.monotonic() + KEEPALIVE_TIMEOUT
+        while time.monotonic() < deadline:
+            ready, _, _ = select.select([self.connection], [], [], 0.25)
+            if ready:
+                return True
+            if not first and self.server_saturated():
+                return False
+        return False
 
+    def request_buffered(self):
+        """True if a pipelined request is already sitting in rfile's buffer."""
+        timeout = self.connection.gettimeout()
         try:
-            src = Path(DIRECTORY) / filename
-            dst_dir = Path(DIRECTORY) / target_dir
-            # IMPORTANT: Use .name to ensure we don't accidentally nest paths if filename has a folder
-            dst = dst_dir / Path(filename).name
+            self.connection.settimeout(0)
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(timeout)
 
-            if not src.exists():
-                self.send_error(404, "File not found")
-                return
-            
-            if not dst_dir.exists():
-                dst_dir.mkdir(exist_ok=True) # Should exist based on list, but safety
+    def send_response(self, code, message=None):
+        """Count responses per connection and close once the cap is reached."""
+        super().send_response(code, message)
+        self.status = code
+        self.requests_served += 1
+        if self.requests_served >= MAX_KEEPALIVE_REQUESTS or self.server_saturated():
+            self.send_header('Connection', 'close')
+        elif not self.close_connection:
+            remaining = MAX_KEEPALIVE_REQUESTS - self.requests_served
+            self.send_header('Keep-Alive', f"timeout={KEEPALIVE_TIMEOUT}, max={remaining}")
 
-            shutil.move(str(src), str(dst))
-            print(f"📂 Moved {filename} to {target_dir}")
-            self.send_json({"success": True})
-        except Exception as e:
-            print(f"❌ Error moving {filename}: {e}")
-            self.send_error(500, str(e))
+    def server_saturated(self):
+        """True when other connections are queued waiting for this worker."""
+        pending = getattr(self.server, 'requests', None)
+        return isinstance(pending, queue.Queue) and not pending.empty()
 
-    def handle_delete(self):
-        """Move file to trash."""
-        data = self.read_json()
-        if not data: return
-        
-        filename = data.get('filename')
-        if not filename:
-            self.send_error(400, "Missing filename")
-            return
-            
-        if not self.validate_filename(filename):
+    def do_POST(self):
+        """Handle JSON API requests."""
+        route = API_ROUTES.get(self.path)
+        if route is None:
+            self.send_error(404, "API endpoint not found")
             return
 
-        try:
-            src = Path(DIRECTORY) / filename
-            trash_dir = Path(DIRECTORY) / "trash"
-            # Use .name for safety
-            dst = trash_dir / Path(filename).name
-
-            if not src.exists():
-                self.send_error(404, "File not found")
-                return
+        data = self.read_json()
+        if data is None: return
 
-            trash_dir.mkdir(exist_ok=True)
-            shutil.move(str(src), str(dst))
-            print(f"🗑️ Moved to trash: {filename}")
-            self.send_json({"success": True})
+        try:
+            self.send_json(route(data))
+        except ApiError as e:
+            self.send_error(e.status, str(e))
         except Exception as e:
-            print(f"❌ Error moving {filename}: {e}")
+            METRICS.error(type(e))
             self.send_error(500, str(e))
 
     def read_json(self):
         try:
             content_length = int(self.headers.get('Content-Length', 0))
+            # Always consume the body so the next request on a kept-alive
+            # connection starts at the right place
             post_data = self.rfile.read(content_length)
+            if not post_data.strip():
+                return {}
             return json.loads(post_data.decode('utf-8'))
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, UnicodeDecodeError, ValueError):
             self.send_error(400, "Invalid JSON")
             return None
 
     def send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
 
-    def validate_filename(self, name):
-        # Allow / and \ for subdirectories (needed for undo), but ABSOLUTELY NO ..
-        if '..' in name:
-            self.send_error(403, "Invalid filename (traversal detected)")
+    def end_headers(self):
+        # Validators and caching policy for the file being sent (self.etag is set per response)
+        etag = self.__dict__.pop('etag', None)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Accept-Ranges', 'bytes')
+            policy = cache_control(self.path)
+            if policy:
+                self.send_header('Cache-Control', policy)
+        super().end_headers()
+
+    def not_modified(self, etag, mtime=None):
+        """
+        Answer 304 if the client's copy is current: If-None-Match lists etag,
+        or, without one, If-Modified-Since is no older than mtime. Returns True if so.
+        """
+        if not client_copy_current(self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since'),
+                                   etag, mtime):
             return False
+        self.etag = etag
+        self.send_response(304)
+        self.end_headers()
         return True
 
     def send_head(self):
-        f = super().send_head()
-        if f and hasattr(self, 'range') and self.range:
-             # Calculate length again to wrap it
-             try:
-                 start, end = self.range.groups()
-                 start = int(start)
-                 fs = os.fstat(f.fileno())
-                 file_len = fs[6]
-                 if end: end = int(end) 
-                 else: end = file_len - 1
-                 
-                 length = end - start + 1
-                 return LimitedFileWrapper(f, length)
-             except:
-                 pass
-        return f
+        try:
+            lease = get_open_files().acquire(self.translate_path(self.path))
+        except OSError:
+            return super().send_head()  # Directories, missing files
+        try:
+            return self.send_file(lease.file, lease.stat, file_etag(lease.stat), lease.content_type,
+                                  lease.release)
+        except BaseException:
+            lease.release()
+            raise
+
+    def send_file(self, f, fs, etag, content_type, release):
+        """
+        Send the headers for a regular file, honouring conditional and Range
+        requests. Returns the body for copyfile, whose close() calls release,
+        or None after calling release when there is no body.
+        """
+        if self.not_modified(etag, fs.st_mtime):
+            release()
+            return None
+        range_header = self.headers.get('Range')
+        if not if_range_matches(self.headers.get('If-Range'), etag, fs.st_mtime):
+            range_header = None  # Changed since the client's partial copy: send it all
+        try:
+            spans = byte_ranges.parse(range_header, fs.st_size)
+        except byte_ranges.RangeNotSatisfiable:
+            self.send_range_not_satisfiable(fs.st_size)
+            release()
+            return None
+
+        self.etag = etag
+        if spans:
+            return self.send_ranges(f, fs, spans, content_type, release)
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(fs.st_size))
+        self.send_header('Last-Modified', self.date_time_string(fs.st_mtime))
+        self.end_headers()
+        return FileSpans(f, [(0, fs.st_size)], release)
+
+    def handle_asset(self):
+        try:
+            # Don't park a pool worker on a render: a page of posters would take them all
+            path, content_type = asset_file(self.path, ASSET_WAIT)
+        except ApiError as e:
+            self.send_error(e.status, str(e))
+            return
+        except RenderPending:
+            self.send_rendering()
+            return
+        self.send_cached_file(path, content_type)
+
+    def send_rendering(self):
+        """503 for an asset still being rendered, with when to ask again."""
+        body = b"Still rendering, retry shortly\n"
+        self.send_response(503)
+        self.send_header('Content-Type', 'text/plain;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Retry-After', str(RETRY_AFTER))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cached_file(self, path, content_type):
+        """
+        Send a generated asset, honouring a byte Range (video previews are seeked).
+        Assets bypass the open-file cache, which their LRU touches would defeat.
+        """
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        try:
+            fs = os.fstat(f.fileno())
+            body = self.send_file(f, fs, asset_etag(path, fs), content_type, f.close)
+        except BaseException:
+            f.close()
+            raise
+        if body is not None:
+            try:
+                if self.command != 'HEAD':
+                    self.copyfile(body, self.wfile)
+            finally:
+                body.close()
+
+    def send_metrics(self):
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', METRICS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_GET(self):
         """Serve static files, mapping app route to the correct file."""
-        if self.path == '/' or self.path == '/video-organizer.html':
+        if self.path == METRICS_PATH:
+            self.send_metrics()
+            return
+
+        if asset_route(self.path):
+            try:
+                self.handle_asset()
+            except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError) as e:
+                METRICS.error(type(e))
+                self.close_connection = True
+            return
+
+        if self.path in APP_ROUTES:
             # Serve the HTML file from the script directory (where server.py is located)
             html_path = SCRIPT_DIR / "video-organizer.html"
-
-            if html_path.exists():
-                try:
-                    self.send_response(200)
-                    self.send_header('Content-type', 'text/html')
-                    self.end_headers()
-                    with open(html_path, 'rb') as f:
-                        self.wfile.write(f.read())
-                    return
-                except Exception as e:
-                    print(f"Error serving HTML: {e}")
-                    self.send_error(500, f"Error loading HTML: {e}")
-                    return
-            else:
+            try:
+                body, etag, mtime = app_shell()
+            except FileNotFoundError:
                 print(f"HTML file not found at: {html_path}")
                 self.send_error(404, f"HTML file not found at {html_path}")
                 return
+            except OSError as e:
+                print(f"Error serving HTML: {e}")
+                self.send_error(500, f"Error loading HTML: {e}")
+                return
+
+            if self.not_modified(etag):
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Last-Modified', self.date_time_string(mtime))
+            self.etag = etag
+            self.end_headers()
+            self.wfile.write(body)
+            return
 
         # Use RangeHTTPRequestHandler logic for files
         try:
             super().do_GET()
-        except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError):
-            pass
+        except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError) as e:
+            METRICS.error(type(e))
+            self.close_connection = True
         except Exception as e:
+            # The response may be half written; never reuse the connection
+            METRICS.error(type(e))
+            self.close_connection = True
             print(f"Error serving file: {e}")
 
 class ThreadedHTTPServer(socketserver.ThreadingTCPServer):
+    """One thread per connection, no limit (the original behaviour)."""
     def service_actions(self):
         pass
     
     def handle_error(self, request, client_address):
+        METRICS.error(sys.exc_info()[0])  # Otherwise silent: counted for /metrics
+
+class PooledHTTPServer(socketserver.TCPServer):
+    """
+    Serves connections on a fixed pool of worker threads.
+    Accepted sockets wait in a bounded queue; once it is full the server
+    either stops accepting (backpressure) or rejects with 503.
+    """
+    daemon_threads = True
+    allow_reuse_address = True  # like http.server.HTTPServer; quick restarts from runner.bat
+
+    def __init__(self, server_address, RequestHandlerClass, pool_size=None,
+                 queue_depth=None, saturation_mode=None, bind_and_activate=True):
+        self.pool_size = pool_size or POOL_SIZE
+        self.queue_depth = queue_depth or QUEUE_DEPTH
+        self.saturation_mode = saturation_mode or SATURATION_MODE
+        # Let the kernel hold a burst of pending connections while we apply backpressure
+        self.request_queue_size = max(self.request_queue_size, self.queue_depth)
+        self.requests = queue.Queue(maxsize=self.queue_depth)
+        self.workers = []
+        super().__init__(server_address, RequestHandlerClass, bind_and_activate)
+        for i in range(self.pool_size):
+            t = threading.Thread(target=self.worker, name=f"http-worker-{i}", daemon=self.daemon_threads)
+            t.start()
+            self.workers.append(t)
+
+    def worker(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        if self.saturation_mode == '503':
+            try:
+                self.requests.put_nowait((request, client_address))
+            except queue.Full:
+                self.reject(request)
+        else:
+            # Blocks serve_forever, so nothing new is accepted until a worker frees up
+            self.requests.put((request, client_address))
+
+    def reject(self, request):
+        """Answer 503 without parsing the request and close the socket."""
+        body = b"Server busy, retry shortly.\n"
+        try:
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: text/plain\r\n"
+                + f"Content-Length: {len(body)}\r\nRetry-After: {RETRY_AFTER}\r\n".encode('ascii')
+                + b"Connection: close\r\n\r\n" + body
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self.workers:
+            self.requests.put(None)
+
+    def service_actions(self):
         pass
 
-if __name__ == "__main__":
-    print(f"🚀 Video Organizer Server on port {PORT}")
+    def handle_error(self, request, client_address):
+        METRICS.error(sys.exc_info()[0])  # Otherwise silent: counted for /metrics
+
+def make_server(address, handler=None, unbounded=False, **pool_options):
+    """Build the HTTP server: a bounded worker pool, or thread-per-connection if unbounded."""
+    handler = handler or GalleryRequestHandler
+    if unbounded:
+        return ThreadedHTTPServer(address, handler)
+    return PooledHTTPServer(address, handler, **pool_options)
+
+def cache_control_option(text):
+    kind, sep, value = text.partition('=')
+    if not sep or kind not in CACHE_CONTROL:
+        raise argparse.ArgumentTypeError(f"expected KIND=VALUE with KIND one of {', '.join(CACHE_CONTROL)}")
+    return kind, value.strip()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Video Organizer server")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backend', choices=['threads', 'asyncio'], default='threads',
+                        help="'asyncio' serves every connection from one event loop")
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE,
+                        help="worker threads serving connections")
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help="accepted connections waiting for a worker")
+    parser.add_argument('--when-saturated', choices=['wait', '503'], default=SATURATION_MODE,
+                        help="'wait' stops accepting, '503' rejects new connections")
+    parser.add_argument('--unbounded', action='store_true',
+                        help="one thread per connection with no limit (old behaviour)")
+    parser.add_argument('--cache-control', type=cache_control_option, action='append', default=[],
+                        metavar='KIND=VALUE',
+                        help=f"Cache-Control for one kind of route ({', '.join(CACHE_CONTROL)}); "
+                             "an empty value sends none")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🚀 Video Organizer Server on port {args.port}")
     print(f"📂 Serving directory: {os.getcwd()}")
     print(f"📄 HTML file location: {SCRIPT_DIR / 'video-organizer.html'}")
-    with ThreadedHTTPServer(("", PORT), GalleryRequestHandler) as httpd:
+    # Stop on SIGTERM like on Ctrl+C, so thumbnail workers don't outlive the server
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    CACHE_CONTROL.update(args.cache_control)
+    if args.backend == 'asyncio':
+        import async_server
+        print("🔁 asyncio backend")
+        try:
+            async_server.run(args.port)
+        except KeyboardInterrupt:
+            print("\n🛑 Server stopped.")
+        finally:
+            close_services()
+        return
+    if args.unbounded:
+        print("🧵 Thread per connection (unbounded)")
+    else:
+        print(f"🧵 Worker pool: {args.pool_size} threads, queue {args.queue_depth}, when saturated: {args.when_saturated}")
+    with make_server(("", args.port), unbounded=args.unbounded, pool_size=args.pool_size,
+                     queue_depth=args.queue_depth, saturation_mode=args.when_saturated) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n🛑 Server stopped.")
+        finally:
+            close_services()
+
+
+if __name__ == "__main__":
+    # Run the copy async_server (and everything else) imports as `server`, so
+    # there is one set of settings and services instead of one per module name
+    import server
+    server.main()
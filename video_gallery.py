@@ -4,36 +4,208 @@ Video Gallery Generator
 Scans parent directory for MP4 and WebM files and creates a beautiful HTML gallery.
 """
 
+import argparse
 import os
 import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from urllib.parse import quote
+import hashlib
 import json
-
-def get_video_files(directory: Path) -> list:
-    """Scan directory for MP4 and WebM files."""
-    video_extensions = {'.mp4', '.webm'}
-    videos = []
-    
-    for file in directory.iterdir():
-        if file.is_file() and file.suffix.lower() in video_extensions:
-            videos.append(file)
-    
-    return sorted(videos, key=lambda x: x.stat().st_mtime, reverse=True)
-
-def generate_html(videos: list, output_path: Path) -> str:
+import sqlite3
+
+from media_info import INFO_FIELDS, probe
+from scan_cache import ScanCache
+
+VIDEO_EXTENSIONS = {'.mp4', '.webm'}
+IGNORED_DIRS = {'trash', 'deleteVideos'}
+MANIFEST_FILE = 'gallery-manifest.ndjson'  # written next to gallery.html
+SCAN_WORKERS = 8  # directories listed at once in a recursive scan (helps most on network shares)
+MANIFEST_BATCH = 1000  # manifest lines serialized per write
+PROBE_BATCH = 1000  # videos probed for media info per catalog write
+
+# One video: path relative to the scanned directory ('/'-separated), size in bytes, mtime,
+# then its media info (None until probed, or where the headers don't say)
+VideoRecord = namedtuple('VideoRecord', ('name', 'size', 'mtime') + INFO_FIELDS,
+                         defaults=(None,) * len(INFO_FIELDS))
+
+
+def scan_directory(directory: Path, prefix: str = '') -> tuple:
+    """
+    List one directory with os.scandir. Returns (records, subdirectories).
+    The file type comes from the directory listing itself and each video is
+    stat'ed once (not at all on Windows, where scandir already has it).
+    """
+    records, subdirs = [], []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS:
+                        subdirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS and entry.is_file():
+                    st = entry.stat()
+                    records.append(VideoRecord(prefix + entry.name, st.st_size, st.st_mtime))
+            except OSError:
+                continue  # Vanished or unreadable: skip it
+    return records, subdirs
+
+
+def scan_folder(directory: Path, folder: str, known: dict) -> tuple:
+    """
+    Scan one folder ('' or 'a/b/') unless its mtime matches `known`.
+    Returns (listing, subdirs): listing is (mtime_ns, records, subdirs) when
+    the folder was listed, or None when the cached listing still holds.
+    """
+    # mtime taken before listing, so a change made meanwhile still shows next time
+    mtime_ns = os.stat(directory / folder).st_mtime_ns
+    cached = known.get(folder)
+    if cached is not None and cached[0] == mtime_ns:
+        return None, cached[1]
+    records, subdirs = scan_directory(directory / folder, folder)
+    return (mtime_ns, records, subdirs), subdirs
+
+
+def scan_changes(directory: Path, known: dict, recursive: bool = False, workers: int = SCAN_WORKERS) -> tuple:
+    """
+    Walk directory (and with recursive=True its subfolders, several at a time),
+    listing only folders whose mtime differs from `known` ({folder: (mtime_ns,
+    subdirs)}). Returns ({folder: (mtime_ns, records, subdirs)} for the folders
+    listed, set of every folder seen).
+    """
+    changed, seen = {}, set()
+    with ThreadPoolExecutor(max_workers=workers if recursive else 1) as pool:
+        pending = {pool.submit(scan_folder, directory, '', known): ''}  # future -> folder
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder = pending.pop(future)
+                try:
+                    listing, subdirs = future.result()
+                except OSError:
+                    continue  # Unreadable or vanished folder
+                seen.add(folder)
+                if listing is not None:
+                    changed[folder] = listing
+                if recursive:
+                    for name in subdirs:
+                        sub = folder + name + '/'
+                        pending[pool.submit(scan_folder, directory, sub, known)] = sub
+    return changed, seen
+
+
+def get_video_files(directory: Path, recursive: bool = False, workers: int = SCAN_WORKERS) -> list:
+    """
+    Scan directory for MP4 and WebM files, newest first, as VideoRecords.
+    With recursive=True subfolders are scanned too, several at a time.
+    """
+    changed, _ = scan_changes(directory, {}, recursive, workers)
+    videos = [record for _, records, _ in changed.values() for record in records]
+    return sorted(videos, key=lambda v: v.mtime, reverse=True)
+
+
+def get_video_files_cached(directory: Path, cache: ScanCache, recursive: bool = False,
+                           workers: int = SCAN_WORKERS, rescan: bool = False) -> list:
+    """
+    Like get_video_files, but only lists folders that changed since the scan
+    recorded in cache (every folder with rescan=True), and updates it.
+    Returns the catalog's videos as a lazy iterator, or None when nothing
+    changed at all.
+    """
+    known = cache.folders()
+    changed, seen = scan_changes(directory, {} if rescan else known, recursive, workers)
+    removed = known.keys() - seen
+    if not changed and not removed:
+        return None
+    cache.update(changed, removed)
+    return cached_videos(cache)
+
+
+def probe_videos(directory: Path, videos, workers: int = SCAN_WORKERS):
+    """VideoRecords for (name, size, mtime) records with their media info, read from the headers in parallel."""
+    def probed(record):
+        info = probe(directory / record[0]) or dict.fromkeys(INFO_FIELDS)
+        return VideoRecord(*record[:3], *(info[field] for field in INFO_FIELDS))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(probed, videos))
+
+
+def probe_catalog(directory: Path, cache: ScanCache, workers: int = SCAN_WORKERS) -> int:
+    """Probe the catalog's videos that have no media info for their size and mtime. Returns how many."""
+    unprobed = cache.unprobed()
+    for start in range(0, len(unprobed), PROBE_BATCH):
+        cache.save_media_info(probe_videos(directory, unprobed[start:start + PROBE_BATCH], workers))
+    return len(unprobed)
+
+
+def cached_videos(cache: ScanCache):
+    """VideoRecords straight from the catalog, newest first, without loading them all."""
+    return map(VideoRecord._make, cache.videos())
+
+
+def generator_fingerprint() -> str:
+    """Changes whenever this script, and so the page it writes, does."""
+    return hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+def write_atomic(path: Path, chunks):
+    """
+    Write an iterable of text chunks to path through a temporary file in the
+    same folder, then rename it over path: the server and browsers see either
+    the old file or the new one, never half of one.
+    """
+    tmp = path.with_name(f".{path.name}.tmp{os.getpid()}")
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def manifest_chunks(videos, count: int):
+    """
+    The video list the gallery page loads, as NDJSON: a header line
+    {"count", "fields"} and then one array per video, its VideoRecord's
+    fields in order.
+    Being line-oriented, the page can render the first page before the rest
+    has arrived. Yields MANIFEST_BATCH lines at a time, so videos can be a
+    lazy iterator and memory stays flat however long the list.
+    """
+    yield json.dumps({"count": count, "fields": list(VideoRecord._fields)}) + '\n'
+    batch = []
+    for v in videos:
+        batch.append(json.dumps(v))
+        if len(batch) == MANIFEST_BATCH:
+            yield '\n'.join(batch) + '\n'
+            batch.clear()
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+def write_manifest(videos, output_path: Path, count: int = None):
+    """Write the manifest for videos (a list, or any iterable given its count)."""
+    write_atomic(output_path, manifest_chunks(videos, len(videos) if count is None else count))
+
+
+def generate_html(manifest_name: str = MANIFEST_FILE) -> str:
     """Generate HTML gallery with client-side pagination to handle thousands of files."""
     
-    # Create the list of filenames for JS
-    # We only need the filename, assuming they are in the same dir as the HTML
-    video_list_js = json.dumps([v.name for v in videos])
+    # The page holds no data itself: it streams the list from the manifest next to it
+    manifest_url = quote(manifest_name)
     
     html_content = f'''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Video Gallery ({len(videos):,} videos)</title>
+    <title>Video Gallery</title>
     <style>
         * {{
             margin: 0;
@@ -130,6 +302,19 @@ def generate_html(videos: list, output_path: Path) -> str:
             font-size: 1rem;
         }}
 
+        .view-select {{
+            background: #1a1a1a;
+            border: 1px solid #333;
+            color: white;
+            padding: 8px 10px;
+            border-radius: 8px;
+            font-size: 0.95rem;
+        }}
+
+        .view-select:disabled {{
+            opacity: 0.5;
+        }}
+
         /* Grid Layout */
         .gallery {{
             display: grid;
@@ -256,7 +441,7 @@ def generate_html(videos: list, output_path: Path) -> str:
 <body>
     <div class="header">
         <h1>🎬 Video Gallery</h1>
-        <p>{len(videos):,} videos available</p>
+        <p id="video-count">Loading videos…</p>
     </div>
 
     <!-- Navigation Controls -->
@@ -270,6 +455,20 @@ def generate_html(videos: list, output_path: Path) -> str:
         
         <button class="btn" id="btn-next" title="Next Page">Next ›</button>
         <button class="btn" id="btn-last" title="Last Page">»</button>
+
+        <select class="view-select" id="sort-select" title="Sort" disabled>
+            <option value="newest">Newest</option>
+            <option value="oldest">Oldest</option>
+            <option value="longest">Longest</option>
+            <option value="shortest">Shortest</option>
+            <option value="largest">Largest</option>
+        </select>
+        <select class="view-select" id="filter-select" title="Filter" disabled>
+            <option value="all">All videos</option>
+            <option value="portrait">Portrait</option>
+            <option value="landscape">Landscape</option>
+            <option value="long">Longer than 10 s</option>
+        </select>
     </div>
     
     <div class="gallery" id="gallery-grid">
@@ -277,13 +476,19 @@ def generate_html(videos: list, output_path: Path) -> str:
     </div>
     
     <script>
-        // Data injected from Python
-        let videoList = {video_list_js};
+        // Filled from the manifest as it streams in: every row, and the names shown
+        let allVideos = [];
+        let videoList = [];
+        let field = {{}}; // Manifest field name -> column in a row
+        let manifestTotal = 0; // Count announced by the manifest header
+        let manifestDone = false;
+        let waitingForPage = null; // Page asked for before its videos arrived
         
         // Configuration
+        const MANIFEST_URL = '{manifest_url}';
         const ITEMS_PER_PAGE = 50; // Keep DOM light
         let currentPage = 1;
-        let totalPages = Math.ceil(videoList.length / ITEMS_PER_PAGE);
+        let totalPages = 0;
 
         // Elements
         const grid = document.getElementById('gallery-grid');
@@ -293,6 +498,29 @@ def generate_html(videos: list, output_path: Path) -> str:
         const btnNext = document.getElementById('btn-next');
         const btnFirst = document.getElementById('btn-first');
         const btnLast = document.getElementById('btn-last');
+        const sortSelect = document.getElementById('sort-select');
+        const filterSelect = document.getElementById('filter-select');
+
+        // Views of the list by media info. The manifest comes newest first; rows with no
+        // value for a sort go last
+        const byField = (name, direction) => (a, b) => {{
+            const x = a[field[name]], y = b[field[name]];
+            if (x === null || y === null) return (x === null) - (y === null);
+            return direction * (x - y);
+        }};
+        const SORTS = {{
+            newest: null,
+            oldest: (a, b) => a[field.mtime] - b[field.mtime],
+            longest: byField('duration', -1),
+            shortest: byField('duration', 1),
+            largest: (a, b) => b[field.size] - a[field.size]
+        }};
+        const FILTERS = {{
+            all: null,
+            portrait: row => row[field.height] > row[field.width],
+            landscape: row => row[field.width] > row[field.height],
+            long: row => row[field.duration] > 10
+        }};
 
         // Observer for lazy loading/playing
         const observerOptions = {{
@@ -303,6 +531,73 @@ def generate_html(videos: list, output_path: Path) -> str:
 
         // Observer removed in favor of hover-to-play/thumbnails
 
+        // Posters are rendered on first request; until one is ready the server
+        // answers 503, so try again a few times before leaving the card bare
+        const POSTER_RETRIES = 5;
+        function loadPoster(video, url, attempt = 0) {{
+            const img = new Image();
+            img.onload = () => {{ video.poster = url; }};
+            img.onerror = () => {{
+                if (attempt < POSTER_RETRIES) setTimeout(() => loadPoster(video, url, attempt + 1), 1000 * (attempt + 1));
+            }};
+            img.src = url;
+        }}
+
+        // Stream the NDJSON manifest, rendering the first page as soon as it is in.
+        // The server sends it with an ETag and "no-cache", so repeat visits
+        // revalidate and get a 304 instead of the whole list again.
+        async function loadManifest() {{
+            const response = await fetch(MANIFEST_URL);
+            if (!response.ok) throw new Error(`Manifest: HTTP ${{response.status}}`);
+
+            let header = null;
+            let buffer = '';
+            const addLines = (text, final) => {{
+                buffer += text;
+                const lines = buffer.split('\\n');
+                buffer = final ? '' : lines.pop();
+                for (const line of lines) {{
+                    if (!line) continue;
+                    const row = JSON.parse(line);
+                    if (header === null) {{
+                        header = row;
+                        manifestTotal = row.count;
+                        header.fields.forEach((name, i) => {{ field[name] = i; }});
+                        updateCount();
+                    }} else {{
+                        allVideos.push(row);
+                        videoList.push(row[0]);
+                    }}
+                }}
+                if (final) {{
+                    manifestDone = true;
+                    // Sorting and filtering need the whole list
+                    sortSelect.disabled = filterSelect.disabled = false;
+                }}
+                if (waitingForPage !== null && (manifestDone || videoList.length >= waitingForPage * ITEMS_PER_PAGE)) {{
+                    renderPage(waitingForPage, false);
+                }}
+            }};
+
+            if (!response.body || !window.TextDecoder) {{
+                addLines(await response.text(), true);
+                return;
+            }}
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            for (;;) {{
+                const {{ done, value }} = await reader.read();
+                addLines(done ? decoder.decode() : decoder.decode(value, {{ stream: true }}), done);
+                if (done) break;
+            }}
+        }}
+
+        function updateCount() {{
+            const count = manifestDone ? videoList.length : Math.max(manifestTotal, videoList.length);
+            document.getElementById('video-count').textContent = `${{count.toLocaleString()}} videos available`;
+            document.title = `Video Gallery (${{count.toLocaleString()}} videos)`;
+        }}
+
         async function deleteVideo(filename, cardElement, event) {{
             // Prevent clicking the link
             event.preventDefault();
@@ -334,9 +629,10 @@ def generate_html(videos: list, output_path: Path) -> str:
                     const index = videoList.indexOf(filename);
                     if (index > -1) {{
                         videoList.splice(index, 1);
+                        manifestTotal--;
                     }}
-                    
-                    // Update header count if we wanted to (optional)
+                    allVideos = allVideos.filter(row => row[0] !== filename);
+                    updateCount();
                     
                 }} else {{
                     const err = await response.text();
@@ -349,9 +645,10 @@ def generate_html(videos: list, output_path: Path) -> str:
             }}
         }}
 
-        function renderPage(page) {{
-            // Recalculate total pages in case items deleted
-            totalPages = Math.ceil(videoList.length / ITEMS_PER_PAGE);
+        function renderPage(page, scroll = true) {{
+            // Recalculate total pages in case items deleted (or more arrived)
+            const totalVideos = manifestDone ? videoList.length : Math.max(manifestTotal, videoList.length);
+            totalPages = Math.ceil(totalVideos / ITEMS_PER_PAGE);
             
             // Clamp page
             if (page < 1) page = 1;
@@ -370,6 +667,15 @@ def generate_html(videos: list, output_path: Path) -> str:
             // Clear Grid
             grid.innerHTML = '';
             
+            // Not streamed in yet: loadManifest() comes back here when it is
+            const needed = Math.min(page * ITEMS_PER_PAGE, totalVideos);
+            if (!manifestDone && (videoList.length < needed || totalVideos === 0)) {{
+                waitingForPage = page;
+                grid.innerHTML = '<div style="color: #666; text-align: center; grid-column: 1/-1; padding: 50px;">Loading…</div>';
+                return;
+            }}
+            waitingForPage = null;
+            
             if (videoList.length === 0) {{
                 grid.innerHTML = '<div style="color: #666; text-align: center; grid-column: 1/-1; padding: 50px;">No videos found</div>';
                 return;
@@ -395,6 +701,8 @@ def generate_html(videos: list, output_path: Path) -> str:
                 // Varied aspect ratios setup (repeating pattern logic in JS if needed, 
                 // but CSS nth-child handles it fine even with dynamic elements)
 
+                // No src until hover: the card shows its poster, and hovering plays a
+                // small pre-rendered preview clip instead of streaming the original
                 card.innerHTML = `
                     <video 
                         loop 
@@ -402,8 +710,6 @@ def generate_html(videos: list, output_path: Path) -> str:
                         muted
                         preload="none"
                         class="video-element"
-                        poster="/thumbnails/${{encodeURIComponent(filename)}}.jpg"
-                        src="${{encodeURIComponent(filename)}}"
                     ></video>
                     <div class="video-overlay">
                         <span class="video-name">${{videoName}}</span>
@@ -413,9 +719,18 @@ def generate_html(videos: list, output_path: Path) -> str:
                 `;
 
                 const video = card.querySelector('video');
+                loadPoster(video, `/thumbnails/${{encodeURIComponent(filename)}}.jpg`);
+                const previewUrl = `/previews/${{encodeURIComponent(filename)}}.mp4`;
+                let hovered = false;
                 
                 // Error handling
                 video.onerror = () => {{
+                    if (video.getAttribute('src') === previewUrl) {{
+                        // No preview for this one (e.g. no ffmpeg on the server): use the original
+                        video.src = encodeURIComponent(filename);
+                        if (hovered) video.play().catch(() => {{}});
+                        return;
+                    }}
                     video.style.opacity = '0.1';
                     card.querySelector('.error-message').style.display = 'block';
                     card.style.border = '1px solid #ff4444';
@@ -423,10 +738,13 @@ def generate_html(videos: list, output_path: Path) -> str:
 
                 // Hover to play
                 card.addEventListener('mouseenter', () => {{
+                   hovered = true;
+                   if (!video.getAttribute('src')) video.src = previewUrl;
                    video.play().catch(() => {{}});
                 }});
                 
                 card.addEventListener('mouseleave', () => {{
+                   hovered = false;
                    video.pause();
                    video.currentTime = 0; // Reset to start
                 }});
@@ -436,7 +754,7 @@ def generate_html(videos: list, output_path: Path) -> str:
             grid.appendChild(fragment);
             
             // Scroll to top of grid
-            window.scrollTo({{ top: 0, behavior: 'smooth' }});
+            if (scroll) window.scrollTo({{ top: 0, behavior: 'smooth' }});
         }}
 
         // Event Listeners
@@ -445,6 +763,18 @@ def generate_html(videos: list, output_path: Path) -> str:
         btnFirst.addEventListener('click', () => renderPage(1));
         btnLast.addEventListener('click', () => renderPage(totalPages));
         
+        function applyView() {{
+            const sort = SORTS[sortSelect.value];
+            const filter = FILTERS[filterSelect.value];
+            let rows = filter ? allVideos.filter(filter) : allVideos.slice();
+            if (sort) rows.sort(sort);
+            videoList = rows.map(row => row[0]);
+            updateCount();
+            renderPage(1);
+        }}
+        sortSelect.addEventListener('change', applyView);
+        filterSelect.addEventListener('change', applyView);
+
         pageInput.addEventListener('change', (e) => {{
             let val = parseInt(e.target.value);
             if (val) renderPage(val);
@@ -452,6 +782,11 @@ def generate_html(videos: list, output_path: Path) -> str:
 
         // Initial Load
         renderPage(1);
+        loadManifest().then(updateCount).catch(error => {{
+            console.error(error);
+            grid.innerHTML = '<div style="color: #ff5555; text-align: center; grid-column: 1/-1; padding: 50px;">'
+                + 'Could not load the video list. Open the gallery through the server (runner.bat).</div>';
+        }});
     </script>
 </body>
 </html>'''
@@ -459,30 +794,90 @@ def generate_html(videos: list, output_path: Path) -> str:
     return html_content
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate gallery.html for a folder of videos.")
+    parser.add_argument('directory', nargs='?', type=Path,
+                        help="folder to scan (default: the parent of this script's folder)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="include videos in subfolders")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS,
+                        help=f"folders scanned in parallel with --recursive (default {SCAN_WORKERS})")
+    parser.add_argument('--rescan', action='store_true',
+                        help="list every folder again instead of trusting unchanged folder mtimes "
+                             "(picks up files rewritten in place)")
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args()
     # Helper script is in display-files/
-    # Target videos are in parent directory ../
+    # Target videos are in parent directory ../ unless a folder is given
     script_dir = Path(__file__).parent.resolve()
-    target_dir = script_dir.parent.resolve()
+    target_dir = (args.directory or script_dir.parent).resolve()
     
-    print(f"📁 Scanning parent directory: {target_dir}")
+    print(f"📁 Scanning directory: {target_dir}")
     
     if not target_dir.exists():
         print(f"❌ Directory not found: {target_dir}")
         sys.exit(1)
     
-    videos = get_video_files(target_dir)
-    print(f"🎬 Found {len(videos)} video(s)")
-    
     # OUTPUT NOW GOES INTO THE PARENT DIRECTORY (next to the videos)
     output_file = target_dir / "gallery.html"
-    html_content = generate_html(videos, output_file)
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    manifest_file = target_dir / MANIFEST_FILE
+
+    try:
+        cache = ScanCache(target_dir)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Scan cache unavailable ({e}), scanning everything")
+        cache = None
+
+    try:
+        started = time.perf_counter()
+        if cache is None:
+            videos = get_video_files(target_dir, recursive=args.recursive, workers=args.workers)
+        else:
+            videos = get_video_files_cached(target_dir, cache, recursive=args.recursive,
+                                            workers=args.workers, rescan=args.rescan)
+        elapsed = time.perf_counter() - started
+
+        # Duration, resolution and codec from the headers of videos new since the last run
+        started = time.perf_counter()
+        if cache is None:
+            probed = len(videos)
+            videos = probe_videos(target_dir, videos, args.workers)
+        else:
+            probed = probe_catalog(target_dir, cache, args.workers)
+        if probed:
+            print(f"🔎 Read media info of {probed} video(s) in {time.perf_counter() - started:.3f}s")
+
+        # The page only changes with this script; the manifest with the videos
+        fingerprint = generator_fingerprint()
+        page_current = cache is not None and output_file.exists() and cache.get('gallery') == fingerprint
+        if videos is None and not probed and page_current and manifest_file.exists():
+            print(f"✨ No changes ({elapsed:.3f}s), {output_file.name} is up to date")
+            return
+        if cache is not None:
+            videos = cached_videos(cache)  # A fresh cursor, with the media info just probed
+        count = len(videos) if cache is None else cache.count()
+        print(f"🎬 Found {count} video(s) in {elapsed:.3f}s")
+
+        root_mtime = os.stat(target_dir).st_mtime_ns
+        write_manifest(videos, manifest_file, count)
+        if not page_current:
+            write_atomic(output_file, [generate_html(MANIFEST_FILE)])
+            if cache is not None:
+                cache.set('gallery', fingerprint)
+        if cache is not None:
+            # Renaming our files into place bumps the folder's mtime; don't
+            # take that for a change next time (unless something else moved it)
+            cache.set_folder_mtime('', os.stat(target_dir).st_mtime_ns, expected=root_mtime)
+    finally:
+        if cache is not None:
+            cache.close()
     
     print(f"\n✅ Gallery created: {output_file}")
-    print(f"   Open this file in your browser to view the gallery")
+    print(f"   Serve this folder with server.py (runner.bat does) and open http://localhost:8001/{output_file.name}")
+    print("   The page loads its video list from the server, so it won't work opened as a file")
 
 
 if __name__ == "__main__":